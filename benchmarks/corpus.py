@@ -0,0 +1,196 @@
+"""Generating synthetic Python 2 code to run modernize on.
+
+The code is made of snippets that each use constructs which modernize
+changes (print statements, ``u''`` literals, ``iteritems()``, urllib
+imports, metaclasses and so on), mixed with code that it leaves alone.
+The same arguments always produce the same files.
+"""
+
+from __future__ import generator_stop
+
+import os
+import random
+
+# Each snippet is a tuple of the imports it needs and its code; ``{n}``
+# makes the names in the code unique within a file.
+SNIPPETS = [
+    (
+        ["import sys"],
+        """\
+def show_{n}(items):
+    for item in items:
+        print "item %s" % (item,)
+    print >>sys.stderr, "shown", len(items)
+    print
+""",
+    ),
+    (
+        [],
+        """\
+GREETING_{n} = u"hello {n}"
+NAMES_{n} = [u'alpha', u"beta", ur"gamma\\d"]
+""",
+    ),
+    (
+        [],
+        """\
+def totals_{n}(mapping):
+    result = {{}}
+    for key, value in mapping.iteritems():
+        result[key] = sum(value)
+    for key in mapping.iterkeys():
+        if mapping.has_key(key):
+            pass
+    return result.items(), mapping.values(), list(mapping.itervalues())
+""",
+    ),
+    (
+        ["import urllib", "import urllib2", "from urlparse import urljoin"],
+        """\
+def fetch_{n}(base, path, params):
+    url = urljoin(base, path) + "?" + urllib.urlencode(params)
+    try:
+        return urllib2.urlopen(urllib.quote(url, safe=":/?=&")).read()
+    except urllib2.HTTPError, err:
+        raise ValueError, "fetching %s failed: %s" % (url, err)
+""",
+    ),
+    (
+        [],
+        """\
+class Meta{n}(type):
+    def __new__(mcs, name, bases, namespace):
+        return type.__new__(mcs, name, bases, namespace)
+
+
+class Model{n}(object):
+    __metaclass__ = Meta{n}
+    fields = ()
+
+    def __unicode__(self):
+        return unicode(self.fields)
+
+    def next(self):
+        raise StopIteration
+""",
+    ),
+    (
+        [],
+        """\
+def ranges_{n}(count):
+    evens = [i for i in xrange(count) if i % 2 == 0]
+    halves = map(lambda i: i / 2, evens)
+    pairs = zip(evens, filter(None, halves))
+    return dict(pairs), range(count)
+""",
+    ),
+    (
+        ["from itertools import izip, imap"],
+        """\
+def merge_{n}(left, right):
+    return list(imap(lambda pair: pair[0] + pair[1], izip(left, right)))
+""",
+    ),
+    (
+        ["import StringIO", "import cPickle", "import ConfigParser"],
+        """\
+def load_{n}(text):
+    parser = ConfigParser.ConfigParser()
+    parser.readfp(StringIO.StringIO(text))
+    return cPickle.dumps(parser.sections())
+""",
+    ),
+    (
+        [],
+        """\
+def check_{n}(value, limit=10L):
+    if isinstance(value, basestring):
+        value = long(value)
+    if isinstance(value, (int, long)) and value > limit:
+        return `value`
+    return unichr(value) if value < 0777 else raw_input("value? ")
+""",
+    ),
+    (
+        [],
+        """\
+def read_{n}(path):
+    handle = file(path)
+    try:
+        data = handle.read()
+    finally:
+        handle.close()
+    exec "result = len(data)"
+    return intern(data), reduce(lambda a, b: a + b, data, "")
+""",
+    ),
+    (
+        [],
+        '''\
+class Plain{n}(object):
+    """A class that modernize does not change."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def double(self):
+        return self.value * 2
+
+    def describe(self):
+        return "Plain{n}(%r)" % (self.value,)
+''',
+    ),
+    (
+        [],
+        """\
+def untouched_{n}(values):
+    total = 0
+    for value in values:
+        if value > 0:
+            total += value
+        elif value < -100:
+            break
+    return total
+""",
+    ),
+]
+
+
+def generate_file(rng, size):
+    """Return the source of a module of about ``size`` bytes."""
+    imports = set()
+    parts = []
+    length = 0
+    n = 0
+    while length < size:
+        snippet_imports, code = rng.choice(SNIPPETS)
+        imports.update(snippet_imports)
+        part = code.format(n=n)
+        parts.append(part)
+        length += len(part) + 2
+        n += 1
+    header = "".join(f"{line}\n" for line in sorted(imports))
+    return header + "\n\n" + "\n\n".join(parts)
+
+
+def generate(directory, files=100, size=4096, seed=0):
+    """Write ``files`` modules of ``size`` bytes on average to ``directory``.
+
+    The sizes vary between a tenth of and twice the average, and the modules
+    are spread over packages of at most 20 modules. Returns the paths of the
+    modules.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for index in range(files):
+        package = os.path.join(directory, f"package{index // 20}")
+        if index % 20 == 0:
+            os.makedirs(package, exist_ok=True)
+            with open(os.path.join(package, "__init__.py"), "w") as f:
+                f.write("")
+        path = os.path.join(package, f"module{index}.py")
+        source = generate_file(rng, int(size * rng.uniform(0.1, 1.9)))
+        with open(path, "w") as f:
+            f.write(source)
+        paths.append(path)
+    return paths
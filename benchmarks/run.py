@@ -0,0 +1,233 @@
+"""End-to-end benchmarks of the modernize command line.
+
+Generates a synthetic Python 2 corpus (see :mod:`corpus`) and runs
+modernize from this source tree on it in several modes, recording for each
+the best wall time of a few runs, the files and bytes refactored per second
+and the peak RSS of the process. The results are written as JSON::
+
+    python benchmarks/run.py --files 200 --output results.json
+
+and can be compared against an earlier result file, which makes the run
+fail if a mode got slower or uses more memory than the tolerance allows::
+
+    python benchmarks/run.py --files 200 --baseline results.json
+
+The peak RSS is only measured where ``os.wait4`` is available.
+"""
+
+from __future__ import generator_stop
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_MAIN = "import sys; from libmodernize.main import main; sys.exit(main())"
+
+# The arguments of each mode and the exit status it is expected to have on
+# the corpus. ``{corpus}`` is replaced by the directory of the corpus.
+MODES = {
+    "diff": (["{corpus}"], 0),
+    "write": (["-w", "-n", "{corpus}"], 0),
+    "enforce": (["--enforce", "{corpus}"], 2),
+    "json": (["--json", "{corpus}"], 0),
+}
+
+
+def corpus_stats(directory):
+    """Return the number of Python files in ``directory`` and their size."""
+    files = size = 0
+    for dirpath, dirnames, filenames in os.walk(directory):
+        for name in filenames:
+            if name.endswith(".py"):
+                files += 1
+                size += os.path.getsize(os.path.join(dirpath, name))
+    return files, size
+
+
+def run_modernize(args, env):
+    """Run modernize with ``args``.
+
+    Returns the wall time in seconds, the exit status, the peak RSS in KiB
+    (None if it cannot be measured here) and what was written to stderr.
+    """
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-c", RUN_MAIN] + args,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr,
+        )
+        rss = None
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            if os.WIFSIGNALED(status):
+                process.returncode = -os.WTERMSIG(status)
+            else:
+                process.returncode = os.WEXITSTATUS(status)
+            rss = usage.ru_maxrss
+            if sys.platform == "darwin":
+                # macOS reports bytes instead of KiB.
+                rss //= 1024
+        else:
+            process.wait()
+        seconds = time.perf_counter() - start
+        stderr.seek(0)
+        error = stderr.read().decode(errors="replace")
+    return seconds, process.returncode, rss, error
+
+
+def benchmark(mode, directory, env, repeat, processes):
+    """Return the measurements of ``mode`` on the corpus in ``directory``."""
+    mode_args, expected_status = MODES[mode]
+    best_seconds = peak_rss = None
+    with tempfile.TemporaryDirectory() as scratch:
+        for _ in range(repeat):
+            target = directory
+            if mode == "write":
+                # Every run gets an unmodified copy to write to.
+                target = os.path.join(scratch, "corpus")
+                shutil.rmtree(target, ignore_errors=True)
+                shutil.copytree(directory, target)
+            args = ["-j", str(processes)] + [
+                arg.format(corpus=target) for arg in mode_args
+            ]
+            seconds, status, rss, error = run_modernize(args, env)
+            if status != expected_status:
+                raise RuntimeError(
+                    f"{mode}: modernize exited with {status} instead of "
+                    f"{expected_status}:\n{error[-2000:]}"
+                )
+            if best_seconds is None or seconds < best_seconds:
+                best_seconds = seconds
+            if rss is not None:
+                peak_rss = rss if peak_rss is None else max(peak_rss, rss)
+    return best_seconds, peak_rss
+
+
+def compare(results, baseline, tolerance):
+    """Return a message for each mode that regressed against ``baseline``.
+
+    A mode regressed if it refactors fewer files per second or has a higher
+    peak RSS than the baseline, by more than the fraction ``tolerance``.
+    """
+    regressions = []
+    for mode, result in results["modes"].items():
+        base = baseline["modes"].get(mode)
+        if base is None:
+            continue
+        speed, base_speed = result["files_per_second"], base["files_per_second"]
+        if speed < base_speed * (1 - tolerance):
+            regressions.append(
+                f"{mode}: {speed:.1f} files/s, baseline {base_speed:.1f} files/s"
+            )
+        rss, base_rss = result["peak_rss_kib"], base["peak_rss_kib"]
+        if rss is not None and base_rss is not None:
+            if rss > base_rss * (1 + tolerance):
+                regressions.append(
+                    f"{mode}: peak RSS {rss} KiB, baseline {base_rss} KiB"
+                )
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--files", type=int, default=100, help="number of modules to generate"
+    )
+    parser.add_argument(
+        "--size", type=int, default=4096, help="average size of a module in bytes"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the generated corpus"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="runs per mode, the best one counts"
+    )
+    parser.add_argument(
+        "-j", "--processes", default="1", help="passed to modernize as -j"
+    )
+    parser.add_argument(
+        "--mode",
+        action="append",
+        choices=sorted(MODES),
+        help="mode to run (default: all of them)",
+    )
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against this result file")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed regression against the baseline as a fraction (default 0.2)",
+    )
+    options = parser.parse_args(args)
+
+    baseline = None
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+    modes = options.mode or list(MODES)
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": {
+            "files": options.files,
+            "size": options.size,
+            "seed": options.seed,
+        },
+        "processes": options.processes,
+        "modes": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, "corpus")
+        corpus.generate(directory, options.files, options.size, options.seed)
+        files, size = corpus_stats(directory)
+        env = dict(os.environ)
+        env["PYTHONPATH"] = ROOT
+        env["MODERNIZE_FIXER_CACHE"] = os.path.join(tmp, "fixers")
+        # Fill the fixer cache, so that no mode pays for it.
+        run_modernize(["--list-fixes"], env)
+        run_modernize([os.path.join(directory, "package0", "module0.py")], env)
+        for mode in modes:
+            seconds, rss = benchmark(
+                mode, directory, env, options.repeat, options.processes
+            )
+            results["modes"][mode] = {
+                "seconds": round(seconds, 4),
+                "files_per_second": round(files / seconds, 2),
+                "bytes_per_second": round(size / seconds),
+                "peak_rss_kib": rss,
+            }
+            print(
+                f"{mode:8} {seconds:8.3f}s {files / seconds:10.1f} files/s "
+                f"{size / seconds / 1024:10.1f} KiB/s  peak RSS {rss} KiB",
+                file=sys.stderr,
+            )
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if baseline is not None:
+        if baseline["corpus"] != results["corpus"]:
+            print("The baseline is of a different corpus.", file=sys.stderr)
+            return 2
+        regressions = compare(results, baseline, options.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
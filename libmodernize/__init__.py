@@ -1,15 +1,17 @@
 from __future__ import generator_stop
 
-from fissix import fixer_util
-from fissix.pgen2 import token
-from fissix.pygram import python_symbols as syms
-from fissix.pytree import Leaf, Node
-
 __version__ = "0.8.3_TIOBE"
 
+# The helpers below import fissix when they are called, so that importing
+# libmodernize (e.g. for the command line) does not.
+
+
 def check_future_import(node):
     """If this is a future import, return set of symbols that are imported,
     else return None."""
+    from fissix.pgen2 import token
+    from fissix.pygram import python_symbols as syms
+
     # node should be the import statement here
     if not (node.type == syms.simple_stmt and node.children):
         return set()
@@ -51,26 +53,76 @@ def check_future_import(node):
         assert 0, "strange import"
 
 
+class _FutureImports:
+    """The ``__future__`` imports at the top of a tree.
+
+    ``features`` are the imported features and ``index`` is the position of
+    ``statement``, the first statement of the tree that is neither a
+    docstring nor a future import, before which new ones are inserted.
+    """
+
+    def __init__(self, root):
+        from fissix.pgen2 import token
+        from fissix.pygram import python_symbols as syms
+
+        self.features = set()
+        for index, node in enumerate(root.children):
+            if (
+                node.type == syms.simple_stmt
+                and len(node.children) > 0
+                and node.children[0].type == token.STRING
+            ):
+                # skip over docstring
+                continue
+            names = check_future_import(node)
+            if not names:
+                # not a future statement; need to insert before this
+                break
+            self.features |= names
+        self.index = index
+        self.statement = node
+
+    @classmethod
+    def of(cls, root):
+        """Return the future imports of ``root``, computed once per tree.
+
+        They are computed again if statements were inserted or removed
+        before the first other statement since.
+        """
+        future_imports = getattr(root, "future_imports", None)
+        if future_imports is None or not (
+            future_imports.index < len(root.children)
+            and root.children[future_imports.index] is future_imports.statement
+        ):
+            future_imports = root.future_imports = cls(root)
+        return future_imports
+
+
 def add_future(node, symbol):
+    from fissix import fixer_util
 
     root = fixer_util.find_root(node)
+    profile = getattr(root, "fixer_profile", None)
+    if profile is None:
+        _add_future(root, symbol)
+    else:
+        with profile.inserting_imports():
+            _add_future(root, symbol)
 
-    for idx, node in enumerate(root.children):
-        if (
-            node.type == syms.simple_stmt
-            and len(node.children) > 0
-            and node.children[0].type == token.STRING
-        ):
-            # skip over docstring
-            continue
-        names = check_future_import(node)
-        if not names:
-            # not a future statement; need to insert before this
-            break
-        if symbol in names:
-            # already imported
-            return
 
+def _add_future(root, symbol):
+    from fissix import fixer_util
+
+    future_imports = _FutureImports.of(root)
+    if symbol in future_imports.features:
+        # already imported
+        return
+
+    from fissix.pgen2 import token
+    from fissix.pygram import python_symbols as syms
+    from fissix.pytree import Leaf, Node
+
+    node = future_imports.statement
     import_ = fixer_util.FromImport(
         "__future__", [Leaf(token.NAME, symbol, prefix=" ")]
     )
@@ -80,14 +132,46 @@ def add_future(node, symbol):
     node.prefix = ""
 
     children = [import_, fixer_util.Newline()]
-    root.insert_child(idx, Node(syms.simple_stmt, children))
+    root.insert_child(future_imports.index, Node(syms.simple_stmt, children))
+    future_imports.features.add(symbol)
+    future_imports.index += 1
 
 
 def touch_import(package, name, node):
-    fixer_util.touch_import(package, name, node)
+    """Like ``fixer_util.touch_import``, but only searches the tree of
+    ``node`` for an import the first time it is called for a name.
+
+    The imports found or added are remembered in ``imported_names`` on the
+    root of the tree, so that fixers may call this for every match. If the
+    root has a ``fixer_profile`` (see :mod:`libmodernize.profiling`), the
+    time this takes is measured.
+    """
+    from fissix import fixer_util
+
+    root = fixer_util.find_root(node)
+    profile = getattr(root, "fixer_profile", None)
+    if profile is None:
+        _touch_import(root, package, name)
+    else:
+        with profile.inserting_imports():
+            _touch_import(root, package, name)
+
+
+def _touch_import(root, package, name):
+    from fissix import fixer_util
+
+    imported = getattr(root, "imported_names", None)
+    if imported is None:
+        imported = root.imported_names = set()
+    if (package, name) not in imported:
+        fixer_util.touch_import(package, name, root)
+        imported.add((package, name))
 
 
 def is_listcomp(node):
+    from fissix.pygram import python_symbols as syms
+    from fissix.pytree import Leaf, Node
+
     def _is_listcomp(node):
         return (
             isinstance(node, Node)
@@ -0,0 +1,145 @@
+"""Running modernize from Python code.
+
+An :class:`Analyzer` records the changes its fixers would make to sources,
+files or directories as :class:`~libmodernize.findings.Finding` objects,
+without writing anything::
+
+    from libmodernize.analyzer import Analyzer
+
+    analyzer = Analyzer()
+    for result in analyzer.analyze("src"):
+        for finding in result.findings:
+            print(result.filename, finding.line, finding.replacement)
+
+An analyzer can be used for any number of calls and from several threads.
+"""
+
+from __future__ import generator_stop
+
+import os
+import threading
+from typing import List, NamedTuple
+
+from libmodernize.findings import Finding
+from libmodernize.fixes import (
+    fissix_fix_names,
+    libmodernize_fix_names,
+    opt_in_fix_names,
+)
+
+
+class AnalysisResult(NamedTuple):
+    """What an :class:`Analyzer` recorded for one source.
+
+    ``errors`` are the messages of the errors, such as a source that cannot
+    be parsed or a file that cannot be read, and ``warnings`` those of the
+    warnings of the fixers.
+    """
+
+    filename: str
+    findings: List[Finding]
+    errors: List[str]
+    warnings: List[str]
+
+
+def default_fixer_names():
+    """Return the names of the fixers that ``modernize`` applies by default.
+
+    That is without ``-f`` and the options that select the fixers for
+    Unicode literals.
+    """
+    return (
+        (fissix_fix_names | libmodernize_fix_names)
+        - opt_in_fix_names
+        - {
+            "libmodernize.fixes.fix_unicode",
+            "libmodernize.fixes.fix_unicode_future",
+        }
+    )
+
+
+class Analyzer:
+    """Records the changes that the fixers ``fixer_names`` would make.
+
+    ``fixer_names`` defaults to :func:`default_fixer_names`, ``flags`` are
+    the options of the fixers (such as ``{"print_function": True}``) and
+    ``explicit`` the fixers among ``fixer_names`` that only run when asked
+    for.
+
+    Each thread gets a refactoring tool of its own the first time it uses
+    the analyzer and reuses it, with its fixers and their compiled patterns,
+    for all its later calls. Nothing else is kept between calls.
+    """
+
+    def __init__(self, fixer_names=None, flags=None, explicit=()):
+        if fixer_names is None:
+            fixer_names = default_fixer_names()
+        self.fixer_names = sorted(fixer_names)
+        self.flags = dict(flags or {})
+        self.explicit = sorted(explicit)
+        self._local = threading.local()
+
+    def _tool(self):
+        tool = getattr(self._local, "tool", None)
+        if tool is None:
+            # Imported here, so that importing this module stays cheap.
+            from libmodernize.refactoring import FindingsRefactoringTool
+
+            tool = FindingsRefactoringTool(
+                self.fixer_names, dict(self.flags), self.explicit, True, False
+            )
+            self._local.tool = tool
+        return tool
+
+    def _run(self, filename, refactor):
+        tool = self._tool()
+        try:
+            refactor(tool)
+            return AnalysisResult(
+                filename,
+                list(tool.findings),
+                [msg % args for msg, args, kwargs in tool.errors],
+                list(tool.fixer_log),
+            )
+        finally:
+            tool.reset()
+
+    def analyze_source(self, source, filename="<string>", doctests_only=False):
+        """Return the :class:`AnalysisResult` of the Python source ``source``.
+
+        ``filename`` is the name the findings and errors refer to.
+        """
+        return self._run(
+            filename,
+            lambda tool: tool.refactor_input(
+                source + "\n", filename, doctests_only=doctests_only
+            ),
+        )
+
+    def analyze_file(self, filename, doctests_only=False):
+        """Return the :class:`AnalysisResult` of the file ``filename``."""
+        return self._run(
+            filename,
+            lambda tool: tool.refactor_file(filename, doctests_only=doctests_only),
+        )
+
+    def analyze(self, *paths, doctests_only=False):
+        """Generate the :class:`AnalysisResult` of each of ``paths``.
+
+        Directories are searched for Python files, in the same way as by
+        ``modernize``, and each of them is analyzed in turn.
+        """
+        for path in paths:
+            if not os.path.isdir(path):
+                yield self.analyze_file(path, doctests_only)
+                continue
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                filenames.sort()
+                for name in filenames:
+                    if not name.startswith(".") and name.endswith(".py"):
+                        yield self.analyze_file(
+                            os.path.join(dirpath, name), doctests_only
+                        )
+                # Skip hidden directories.
+                dirnames[:] = [dn for dn in dirnames if not dn.startswith(".")]
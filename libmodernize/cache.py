@@ -0,0 +1,118 @@
+"""On-disk cache of the results of refactoring unchanged files."""
+
+from __future__ import generator_stop
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+
+class ResultCache:
+    """A size-bounded cache of pickled results in ``directory``.
+
+    Entries are named by the hex digest of their key and stored two levels
+    deep. They are written to a temporary file that is then renamed into
+    place, so concurrent writers (``-j`` workers or separate runs sharing the
+    directory) never see a partially written entry; when two processes store
+    the same key the last rename wins, which is fine because both wrote the
+    same result.
+
+    Reading an entry refreshes its modification time. Once the entries take
+    more than ``max_size`` bytes, the least recently used ones are removed
+    until they fit in 90% of it again.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self._written = 0
+
+    @staticmethod
+    def key(*parts):
+        """Return the key for ``parts``, a sequence of strings."""
+        digest = hashlib.sha256()
+        for part in parts:
+            data = part.encode("utf-8", "surrogatepass")
+            digest.update(b"%d:" % len(data))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """Return the value stored for ``key``, or None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A corrupt or incompatible entry is just a miss.
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        """Store ``value`` for ``key``; failures to write are ignored."""
+        path = self._path(key)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            return
+        self._written += len(data)
+        if self._written > self.max_size // 10:
+            self.prune()
+
+    def prune(self):
+        """Evict the least recently used entries if the cache is too big."""
+        self._written = 0
+        entries = []
+        total = 0
+        try:
+            subdirs = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for subdir in subdirs:
+            if not subdir.is_dir(follow_symlinks=False):
+                continue
+            try:
+                with os.scandir(subdir.path) as it:
+                    for entry in it:
+                        try:
+                            stat = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            # Removed by a concurrent prune.
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+            except OSError:
+                continue
+        if total <= self.max_size:
+            return
+        entries.sort()
+        target = self.max_size * 9 // 10
+        for mtime, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
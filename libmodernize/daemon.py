@@ -0,0 +1,292 @@
+"""A server that keeps refactoring tools warm between modernize runs.
+
+``modernize-daemon`` listens on a Unix domain socket. ``modernize-client``
+takes the same arguments as ``modernize`` and, if a daemon is listening,
+has it do the run instead: the client sends its arguments, working
+directory and (for ``-``) standard input, and prints the output and exits
+with the status of the run. Without a daemon the client runs modernize
+itself.
+
+The daemon reuses one refactoring tool per combination of fixers and
+flags, so the fixers are imported and their patterns compiled only once.
+Requests are handled one at a time.
+"""
+
+from __future__ import generator_stop
+
+import io
+import json
+import logging
+import optparse
+import os
+import signal
+import socket
+import sys
+import tempfile
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+
+SOCKET_ENV = "MODERNIZE_SOCKET"
+
+
+def default_socket_path():
+    """Return the path of the daemon's socket.
+
+    That is ``$MODERNIZE_SOCKET`` if set, otherwise ``modernize.sock`` in
+    ``$XDG_RUNTIME_DIR`` or in a per-user directory in the temporary
+    directory.
+    """
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "modernize.sock")
+    return os.path.join(
+        tempfile.gettempdir(), f"modernize-{os.getuid()}", "modernize.sock"
+    )
+
+
+def _is_private_directory(directory):
+    try:
+        directory_stat = os.stat(directory)
+    except OSError:
+        return False
+    return directory_stat.st_uid == os.getuid() and not directory_stat.st_mode & 0o022
+
+
+def _is_private(path):
+    """Return whether ``path`` and its directory belong to the current user,
+    and no one else may write to the directory.
+
+    Anyone may create files in a shared directory such as the temporary
+    directory, so a socket there could be another user's.
+    """
+    try:
+        path_stat = os.stat(path)
+    except OSError:
+        return False
+    return path_stat.st_uid == os.getuid() and _is_private_directory(
+        os.path.dirname(os.path.abspath(path))
+    )
+
+
+class ToolPool:
+    """Refactoring tools kept for reuse, keyed by their arguments."""
+
+    def __init__(self):
+        self._tools = {}
+
+    def __len__(self):
+        return len(self._tools)
+
+    def get(self, tool_class, fixer_names, flags, explicit, nobackups, show_diffs):
+        """Return a reset `tool_class` created with these arguments."""
+        key = (
+            tool_class,
+            tuple(fixer_names),
+            tuple(sorted(flags.items())),
+            tuple(explicit),
+            nobackups,
+            show_diffs,
+        )
+        tool = self._tools.get(key)
+        if tool is None:
+            tool = tool_class(fixer_names, flags, explicit, nobackups, show_diffs)
+            self._tools[key] = tool
+        else:
+            tool.reset()
+        return tool
+
+
+def _recv_all(conn):
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+class _CurrentStderr:
+    """A stream that writes to whatever ``sys.stderr`` currently is."""
+
+    def write(self, text):
+        sys.stderr.write(text)
+
+    def flush(self):
+        sys.stderr.flush()
+
+
+class Daemon:
+    """Serves modernize runs on the Unix domain socket at `path`."""
+
+    def __init__(self, path):
+        # Imported here, so that the client starts quickly.
+        from libmodernize.main import main
+
+        self.path = path
+        self.tools = ToolPool()
+        self._main = main
+        # main() configures logging only once; let the log follow the
+        # redirected sys.stderr of each request.
+        logging.basicConfig(format="%(name)s: %(message)s", stream=_CurrentStderr())
+
+    def run(self, args, cwd, stdin="", prog=None):
+        """Run modernize with `args` in `cwd` and return (status, out, err).
+
+        `prog` is the program name used in usage messages.
+        """
+        stdout, stderr = io.StringIO(), io.StringIO()
+        real_stdin, real_cwd, real_argv = sys.stdin, os.getcwd(), sys.argv
+        try:
+            sys.stdin = io.StringIO(stdin)
+            sys.argv = [prog or "modernize"] + args
+            os.chdir(cwd)
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                try:
+                    status = self._main(args, self.tools)
+                except SystemExit as exc:
+                    # optparse exits for --help, --version and usage errors.
+                    if exc.code is None or isinstance(exc.code, int):
+                        status = exc.code or 0
+                    else:
+                        print(exc.code, file=sys.stderr)
+                        status = 1
+                except Exception:
+                    traceback.print_exc()
+                    status = 1
+        finally:
+            sys.stdin, sys.argv = real_stdin, real_argv
+            os.chdir(real_cwd)
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def handle(self, conn):
+        try:
+            request = json.loads(_recv_all(conn).decode("utf-8"))
+            status, out, err = self.run(
+                request["args"],
+                request["cwd"],
+                request.get("stdin", ""),
+                request.get("prog"),
+            )
+        except Exception:
+            # A malformed request fails on its own, the daemon keeps serving.
+            status, out, err = 1, "", traceback.format_exc()
+        response = {"status": status, "stdout": out, "stderr": err}
+        conn.sendall(json.dumps(response).encode("utf-8"))
+
+    def serve_forever(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if not _is_private_directory(directory):
+            raise RuntimeError(
+                f"{directory} is not private to the current user, clients "
+                "would not trust a socket in it"
+            )
+        if os.path.exists(self.path):
+            if _connect(self.path) is not None:
+                raise RuntimeError(f"a daemon is already listening on {self.path}")
+            # Left behind by a daemon that did not shut down cleanly.
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Only the user running the daemon may connect to it.
+        umask = os.umask(0o177)
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(umask)
+        try:
+            server.listen()
+            while True:
+                conn, _ = server.accept()
+                with conn:
+                    try:
+                        self.handle(conn)
+                    except OSError:
+                        traceback.print_exc()
+        finally:
+            server.close()
+            os.unlink(self.path)
+
+
+def _connect(path):
+    if not _is_private(path):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def request(path, args, stdin=""):
+    """Have the daemon at `path` run modernize with `args`.
+
+    Returns (status, stdout, stderr), or None if no daemon is listening, or
+    if the socket, or its directory, is not private to the current user.
+    """
+    client = _connect(path)
+    if client is None:
+        return None
+    with client:
+        payload = {
+            "args": args,
+            "cwd": os.getcwd(),
+            "stdin": stdin,
+            "prog": os.path.basename(sys.argv[0]),
+        }
+        client.sendall(json.dumps(payload).encode("utf-8"))
+        client.shutdown(socket.SHUT_WR)
+        response = _recv_all(client)
+    if not response:
+        return None
+    response = json.loads(response.decode("utf-8"))
+    return response["status"], response["stdout"], response["stderr"]
+
+
+def client_main(args=None):
+    """Entry point of ``modernize-client``, see the module docstring."""
+    if args is None:
+        args = sys.argv[1:]
+    stdin = sys.stdin.read() if "-" in args else ""
+    result = request(default_socket_path(), args, stdin)
+    if result is None:
+        from libmodernize.main import main
+
+        if stdin:
+            sys.stdin = io.StringIO(stdin)
+        return main(args)
+    status, out, err = result
+    sys.stderr.write(err)
+    sys.stdout.write(out)
+    return status
+
+
+def _interrupt(signum, frame):
+    # Unlike SystemExit, not caught by Daemon.run(); serve_forever() then
+    # removes the socket.
+    raise KeyboardInterrupt
+
+
+def main(args=None):
+    """Entry point of ``modernize-daemon``."""
+    parser = optparse.OptionParser(usage="modernize-daemon [--socket PATH]")
+    parser.add_option(
+        "--socket",
+        default=None,
+        help=f"Listen on this Unix domain socket (default: ${SOCKET_ENV}, "
+        "$XDG_RUNTIME_DIR/modernize.sock or one in the temporary directory).",
+    )
+    options, args = parser.parse_args(args)
+    if args:
+        parser.error("No arguments expected.")
+    daemon = Daemon(options.socket or default_socket_path())
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,226 @@
+"""Unified diffs of refactored files, computed around the changed lines.
+
+:func:`difflib.unified_diff` matches every line of the original against every
+line of the refactored text, which takes longer than refactoring a module of
+a few thousand lines. The fixers only change a few lines here and there, so
+:func:`diff_texts` walks both texts in step, and only when they differ looks
+ahead for the point where they agree again (:data:`SYNC_LINES` equal lines).
+Only the lines in between are compared with :class:`difflib.SequenceMatcher`.
+The output has the same format as :func:`fissix.main.diff_texts`, and is the
+diff that :mod:`difflib` finds without its "popular lines" heuristic, unless
+a change is ambiguous, e.g. within repeated lines.
+"""
+
+from __future__ import generator_stop
+
+import re
+from difflib import SequenceMatcher
+
+# Equal lines after which the texts are taken to agree again.
+SYNC_LINES = 3
+# Lines looked ahead for that point at first, and at most.
+FIRST_WINDOW = 32
+MAX_WINDOW = 1024
+
+
+def _resync(a, b, i, j, window):
+    """Return the ``(x, y)`` closest to ``(i, j)``, within ``window`` lines
+    of both, such that ``a[x:]`` and ``b[y:]`` start with the same
+    :data:`SYNC_LINES` lines (or are equal), or None."""
+    positions = {}
+    for y in range(j, min(len(b), j + window)):
+        positions.setdefault(b[y], []).append(y)
+    best = None
+    for x in range(i, min(len(a), i + window)):
+        if best is not None and x - i >= best[0]:
+            break
+        for y in positions.get(a[x], ()):
+            cost = x - i + y - j
+            if best is not None and cost >= best[0]:
+                break
+            if a[x : x + SYNC_LINES] == b[y : y + SYNC_LINES]:
+                best = cost, x, y
+                break
+    return best and best[1:]
+
+
+def _changed(a, b, i1, i2, j1, j2):
+    """Yield the opcodes turning ``a[i1:i2]`` into ``b[j1:j2]``."""
+    if i1 == i2:
+        yield "insert", i1, i2, j1, j2
+    elif j1 == j2:
+        yield "delete", i1, i2, j1, j2
+    else:
+        matcher = SequenceMatcher(None, a[i1:i2], b[j1:j2])
+        for tag, k1, k2, l1, l2 in matcher.get_opcodes():
+            yield tag, i1 + k1, i1 + k2, j1 + l1, j1 + l2
+
+
+def _opcodes(a, b):
+    """Yield the opcodes turning ``a`` into ``b``, as
+    :meth:`difflib.SequenceMatcher.get_opcodes` does."""
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start_i, start_j = i, j
+        while i < len(a) and j < len(b) and a[i] == b[j]:
+            i += 1
+            j += 1
+        if i > start_i:
+            yield "equal", start_i, i, start_j, j
+            continue
+        window = FIRST_WINDOW
+        sync = _resync(a, b, i, j, window)
+        while sync is None and window < min(MAX_WINDOW, max(len(a) - i, len(b) - j)):
+            window = min(window * 4, MAX_WINDOW)
+            sync = _resync(a, b, i, j, window)
+        if sync is not None:
+            x, y = sync
+            yield from _changed(a, b, i, x, j, y)
+            i, j = x, y
+            continue
+        # Nothing agrees nearby: compare a window of both, up to the last
+        # lines that are equal in it.
+        x, y = min(len(a), i + window), min(len(b), j + window)
+        codes = list(_changed(a, b, i, x, j, y))
+        equal = [index for index, code in enumerate(codes) if code[0] == "equal"]
+        if equal and (x, y) != (len(a), len(b)):
+            codes = codes[: equal[-1] + 1]
+        yield from codes
+        i, j = codes[-1][2], codes[-1][4]
+    if i < len(a) or j < len(b):
+        yield from _changed(a, b, i, len(a), j, len(b))
+
+
+def _merged_opcodes(a, b):
+    codes = []
+    for code in _opcodes(a, b):
+        if codes and code[0] == codes[-1][0] == "equal":
+            codes[-1] = ("equal", codes[-1][1], code[2], codes[-1][3], code[4])
+        else:
+            codes.append(code)
+    return codes
+
+
+def _grouped_opcodes(codes, n):
+    """Group ``codes`` into hunks with ``n`` lines of context, as
+    :meth:`difflib.SequenceMatcher.get_grouped_opcodes` does."""
+    if not codes:
+        codes = [("equal", 0, 1, 0, 1)]
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _format_range(start, stop):
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def unified_diff(a, b, fromfile="", tofile="", fromfiledate="", tofiledate="", n=3):
+    """Yield the lines, without line endings, of the unified diff between the
+    lists of lines ``a`` and ``b``, like :func:`difflib.unified_diff`."""
+    started = False
+    for group in _grouped_opcodes(_merged_opcodes(a, b), n):
+        if not started:
+            started = True
+            fromdate = f"\t{fromfiledate}" if fromfiledate else ""
+            todate = f"\t{tofiledate}" if tofiledate else ""
+            yield f"--- {fromfile}{fromdate}"
+            yield f"+++ {tofile}{todate}"
+        first, last = group[0], group[-1]
+        yield "@@ -{} +{} @@".format(
+            _format_range(first[1], last[2]), _format_range(first[3], last[4])
+        )
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in a[i1:i2]:
+                    yield " " + line
+                continue
+            if tag in ("replace", "delete"):
+                for line in a[i1:i2]:
+                    yield "-" + line
+            if tag in ("replace", "insert"):
+                for line in b[j1:j2]:
+                    yield "+" + line
+
+
+def diff_texts(a, b, filename):
+    """Return a unified diff of two strings."""
+    return unified_diff(
+        a.splitlines(), b.splitlines(), filename, filename, "(original)", "(refactored)"
+    )
+
+
+_HUNK = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def parse_unified_diff(lines):
+    """Return the changes in the unified diff of any number of files read
+    from the iterable ``lines``, in a single pass.
+
+    The changes are keyed by file, then by the ``@@`` line of their hunk,
+    then by the line number where each run of changed lines starts: in the
+    refactored file if the run starts with an added line, in the original
+    otherwise. A run is the text of its ``-`` and ``+`` lines.
+    """
+    changes = {}
+    filename = None
+    hunk = None
+    run = []
+    # Lines of the current hunk still to come, and their line numbers.
+    old_left = new_left = 0
+    old_line = new_line = 0
+    for line in lines:
+        line = line.rstrip("\n")
+        if old_left > 0 or new_left > 0:
+            tag = line[:1]
+            if tag == "-" or tag == "+":
+                if not run:
+                    start = old_line if tag == "-" else new_line
+                    hunk[start] = run
+                run.append(line + "\n")
+                if tag == "-":
+                    old_left -= 1
+                    old_line += 1
+                else:
+                    new_left -= 1
+                    new_line += 1
+            elif tag != "\\":
+                old_left -= 1
+                new_left -= 1
+                old_line += 1
+                new_line += 1
+                run = []
+        elif line.startswith("--- "):
+            filename = line[4:].split("\t", 1)[0]
+        elif line.startswith("@@"):
+            match = _HUNK.match(line)
+            old_line, old_length, new_line, new_length = match.groups()
+            old_line, new_line = int(old_line), int(new_line)
+            old_left = 1 if old_length is None else int(old_length)
+            new_left = 1 if new_length is None else int(new_length)
+            hunk = changes.setdefault(filename, {})[line] = {}
+            run = []
+    for hunks in changes.values():
+        for hunk in hunks.values():
+            for start, run in hunk.items():
+                hunk[start] = "".join(run)
+    return changes
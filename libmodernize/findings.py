@@ -0,0 +1,94 @@
+"""Structured findings recorded while the fixers transform a tree."""
+
+from __future__ import generator_stop
+
+from collections import OrderedDict
+from typing import NamedTuple
+
+
+class Finding(NamedTuple):
+    """A single change made by a fixer, located in the original source.
+
+    ``line`` and ``column`` are the position of the matched node in the
+    original file (lines count from 1, columns from 0). An ``original`` of
+    ``""`` means that ``replacement`` was inserted before that position.
+    """
+
+    fixer: str
+    filename: str
+    line: int
+    column: int
+    original: str
+    replacement: str
+
+    def to_json(self):
+        return {
+            "filename": self.filename,
+            "line": self.line,
+            "column": self.column,
+            "original": self.original,
+            "replacement": self.replacement,
+        }
+
+    def to_record(self):
+        """Return the finding without its fixer and file, as a compact
+        ``[line, column, original, replacement]`` list."""
+        return [self.line, self.column, self.original, self.replacement]
+
+
+class FindingCollection:
+    """The findings of a run, in the order in which they were recorded."""
+
+    def __init__(self, findings=()):
+        self._findings = list(findings)
+
+    def __iter__(self):
+        return iter(self._findings)
+
+    def __len__(self):
+        return len(self._findings)
+
+    def add(self, finding):
+        self._findings.append(finding)
+
+    def extend(self, findings):
+        self._findings.extend(findings)
+
+    def by_fixer(self, fixer_names=()):
+        """Return an ordered mapping of fixer name to its sorted findings.
+
+        Every name in ``fixer_names`` is present, even without findings.
+        """
+        grouped = OrderedDict((name, []) for name in sorted(fixer_names))
+        for finding in self._findings:
+            grouped.setdefault(finding.fixer, []).append(finding)
+        for findings in grouped.values():
+            findings.sort(key=lambda f: (f.filename, f.line, f.column))
+        return grouped
+
+    def to_json(self, fixer_names=()):
+        """Return the findings grouped per fixer, then per file, as JSON
+        serializable data, with each finding as in :meth:`Finding.to_record`.
+        """
+        grouped = {}
+        for fixer, findings in self.by_fixer(fixer_names).items():
+            files = grouped[fixer] = {}
+            for finding in findings:
+                files.setdefault(finding.filename, []).append(finding.to_record())
+        return grouped
+
+
+def node_text(*nodes):
+    """Return the source of ``nodes`` without the prefix of the first one."""
+    text = "".join(str(node) for node in nodes)
+    if nodes:
+        text = text[len(nodes[0].prefix) :]
+    return text
+
+
+def node_position(node):
+    """Return the (line, column) of the first leaf of ``node``."""
+    leaf = next(node.leaves(), None)
+    if leaf is None:
+        return 0, 0
+    return leaf.lineno, leaf.column
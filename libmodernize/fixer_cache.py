@@ -0,0 +1,218 @@
+"""Cache of set up fixers, with their compiled patterns and bottom matcher.
+
+Setting up a refactoring tool compiles the ``PATTERN`` of every fixer and
+builds the bottom matcher automaton from them, which takes longer than
+refactoring a small file. :func:`setup_fixers` pickles the fixers and the
+automaton of a tool to a cache file keyed by the fixer names, the sources of
+the fixer modules, the options and the versions involved, and loads them
+from there the next time.
+"""
+
+from __future__ import generator_stop
+
+import hashlib
+import importlib.util
+import io
+import os
+import pickle
+import sys
+from itertools import chain
+
+import fissix
+from fissix import btm_matcher, refactor
+
+from libmodernize import __version__
+from libmodernize.cache import ResultCache
+
+FORMAT_VERSION = 2
+CACHE_ENV = "MODERNIZE_FIXER_CACHE"
+MAX_SIZE = 32 * 1024 * 1024
+
+
+def default_directory():
+    """Return the directory of the fixer cache, or None if it is disabled.
+
+    That is ``$MODERNIZE_FIXER_CACHE`` if set (an empty value disables the
+    cache), otherwise ``modernize/fixers`` in the user's cache directory.
+    """
+    directory = os.environ.get(CACHE_ENV)
+    if directory is not None:
+        return directory or None
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "modernize", "fixers")
+
+
+def _source_hash(module_name):
+    try:
+        spec = importlib.util.find_spec(module_name)
+    except (ImportError, ValueError):
+        return None
+    if spec is None or not spec.has_location:
+        return None
+    try:
+        with open(spec.origin, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, file, tool, fixers):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.tool = tool
+        # Only needed to build the bottom matcher, which is cached as well.
+        self.pattern_trees = {
+            id(fixer.pattern_tree)
+            for fixer in fixers
+            if getattr(fixer, "pattern_tree", None) is not None
+        }
+
+    def persistent_id(self, obj):
+        if obj is self.tool.options:
+            return "options"
+        if obj is self.tool.fixer_log:
+            return "fixer_log"
+        if id(obj) in self.pattern_trees:
+            return "pattern_tree"
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, tool):
+        super().__init__(file)
+        self.tool = tool
+
+    def persistent_load(self, pid):
+        if pid == "options":
+            return self.tool.options
+        if pid == "fixer_log":
+            return self.tool.fixer_log
+        if pid == "pattern_tree":
+            return None
+        raise pickle.UnpicklingError(f"unknown persistent id {pid!r}")
+
+
+class FixerCache:
+    """The fixers of refactoring tools, stored in ``directory``."""
+
+    def __init__(self, directory):
+        self.entries = ResultCache(directory, MAX_SIZE)
+
+    def key(self, tool):
+        """Return the key for the fixers of ``tool``, or None if the source
+        of one of them cannot be found."""
+        parts = [
+            str(FORMAT_VERSION),
+            fissix.__version__,
+            __version__,
+            sys.version,
+            repr(sorted(tool.options.items())),
+            repr(sorted(tool.explicit) if tool.explicit is not True else True),
+        ]
+        for fixer_name in tool.fixers:
+            source_hash = _source_hash(fixer_name)
+            if source_hash is None:
+                return None
+            parts += [fixer_name, source_hash]
+        return self.entries.key(*parts)
+
+    def load(self, key, tool):
+        """Return the fixers state stored for ``key``, or None."""
+        data = self.entries.get(key)
+        if data is None:
+            return None
+        try:
+            return _Unpickler(io.BytesIO(data), tool).load()
+        except Exception:
+            # Stale or corrupt; it will be replaced.
+            return None
+
+    def store(self, key, tool, state):
+        """Store ``state``, the fixers state of ``tool``, for ``key``."""
+        pre_order, post_order = state[:2]
+        data = io.BytesIO()
+        try:
+            _Pickler(data, tool, chain(pre_order, post_order)).dump(state)
+        except Exception:
+            # Some fixer holds on to something that cannot be pickled.
+            return
+        self.entries.put(key, data.getvalue())
+
+
+def headnode_dict(fixers):
+    """Return the traversal heads of ``fixers``, as ``RefactoringTool`` sets
+    them up, but empty if there are no ``fixers``.
+
+    ``RefactoringTool.traverse_by`` only skips the traversal of a tree for
+    empty heads, and would otherwise visit every node for nothing.
+    """
+    if not fixers:
+        return {}
+    return refactor._get_headnode_dict(fixers)
+
+
+def build_fixers(tool):
+    """Return the fixers state of ``tool`` as ``RefactoringTool`` sets it up."""
+    pre_order, post_order = tool.get_fixers()
+    matcher = btm_matcher.BottomMatcher()
+    bmi_pre_order = []
+    bmi_post_order = []
+    for fixer in chain(post_order, pre_order):
+        if fixer.BM_compatible:
+            matcher.add_fixer(fixer)
+        elif fixer in pre_order:
+            bmi_pre_order.append(fixer)
+        elif fixer in post_order:
+            bmi_post_order.append(fixer)
+    return (
+        pre_order,
+        post_order,
+        matcher,
+        bmi_pre_order,
+        bmi_post_order,
+        headnode_dict(bmi_pre_order),
+        headnode_dict(bmi_post_order),
+    )
+
+
+def setup_fixers(tool, directory=None):
+    """Set up the fixers named by ``tool.fixers`` and the bottom matcher.
+
+    ``tool`` is a ``RefactoringTool`` that was initialized without fixers.
+    The fixers are loaded from the cache in ``directory`` (by default
+    :func:`default_directory`) if possible, and stored there otherwise.
+    Fixers loaded from the cache have no ``pattern_tree``.
+    """
+    if directory is None:
+        directory = default_directory()
+    cache = key = state = None
+    if directory is not None and tool.fixers:
+        cache = FixerCache(directory)
+        key = cache.key(tool)
+    if key is not None:
+        state = cache.load(key, tool)
+    if state is None:
+        state = build_fixers(tool)
+        if key is not None:
+            cache.store(key, tool, state)
+    else:
+        loaded = {type(fixer).__module__ for fixer in chain(*state[:2])}
+        for fixer_name in tool.fixers:
+            fix_name = fixer_name.rsplit(".", 1)[-1]
+            if fix_name.startswith(tool.FILE_PREFIX):
+                fix_name = fix_name[len(tool.FILE_PREFIX) :]
+            if fixer_name in loaded:
+                tool.log_debug("Adding transformation: %s", fix_name)
+            else:
+                tool.log_message("Skipping optional fixer: %s", fix_name)
+    (
+        tool.pre_order,
+        tool.post_order,
+        tool.BM,
+        tool.bmi_pre_order,
+        tool.bmi_post_order,
+        tool.bmi_pre_order_heads,
+        tool.bmi_post_order_heads,
+    ) = state
@@ -1,5 +1,7 @@
 from __future__ import generator_stop
 
+import re
+
 fissix_fix_names = {
     "fissix.fixes.fix_apply",
     "fissix.fixes.fix_asserts",
@@ -31,6 +33,36 @@ fissix_fix_names = {
 
 lib2to3_fix_names = fissix_fix_names
 
+# All fixers of this package, listed here so that they are known without
+# importing anything.
+libmodernize_fix_names = {
+    "libmodernize.fixes.fix_basestring",
+    "libmodernize.fixes.fix_classic_division",
+    "libmodernize.fixes.fix_dict_six",
+    "libmodernize.fixes.fix_file",
+    "libmodernize.fixes.fix_filter",
+    "libmodernize.fixes.fix_import",
+    "libmodernize.fixes.fix_imports_six",
+    "libmodernize.fixes.fix_input_six",
+    "libmodernize.fixes.fix_int_long_tuple",
+    "libmodernize.fixes.fix_itertools_imports_six",
+    "libmodernize.fixes.fix_itertools_six",
+    "libmodernize.fixes.fix_map",
+    "libmodernize.fixes.fix_metaclass",
+    "libmodernize.fixes.fix_next",
+    "libmodernize.fixes.fix_open",
+    "libmodernize.fixes.fix_print",
+    "libmodernize.fixes.fix_raise",
+    "libmodernize.fixes.fix_raise_six",
+    "libmodernize.fixes.fix_unichr",
+    "libmodernize.fixes.fix_unicode",
+    "libmodernize.fixes.fix_unicode_future",
+    "libmodernize.fixes.fix_unicode_type",
+    "libmodernize.fixes.fix_urllib_six",
+    "libmodernize.fixes.fix_xrange_six",
+    "libmodernize.fixes.fix_zip",
+}
+
 # fixes that involve using six
 six_fix_names = {
     "libmodernize.fixes.fix_basestring",
@@ -57,3 +89,147 @@ opt_in_fix_names = {
     "libmodernize.fixes.fix_classic_division",
     "libmodernize.fixes.fix_open",
 }
+
+# Names and other tokens that a fixer needs to find in the source to change
+# anything; a file in which none of them occur is left alone by that fixer.
+# Names only count as whole words, and compiled patterns are searched for.
+# Fixers that are not listed always run.
+fixer_triggers = {
+    "fissix.fixes.fix_apply": ("apply",),
+    "fissix.fixes.fix_asserts": (
+        "assertAlmostEquals",
+        "assertEquals",
+        "assertNotAlmostEquals",
+        "assertNotEquals",
+        "assertRaisesRegexp",
+        "assertRegexpMatches",
+        "assert_",
+        "failIf",
+        "failIfAlmostEqual",
+        "failIfEqual",
+        "failUnless",
+        "failUnlessAlmostEqual",
+        "failUnlessEqual",
+        "failUnlessRaises",
+    ),
+    "fissix.fixes.fix_except": ("except",),
+    "fissix.fixes.fix_exec": ("exec",),
+    "fissix.fixes.fix_execfile": ("execfile",),
+    "fissix.fixes.fix_exitfunc": ("exitfunc",),
+    "fissix.fixes.fix_funcattrs": (
+        "func_closure",
+        "func_doc",
+        "func_globals",
+        "func_name",
+        "func_defaults",
+        "func_code",
+        "func_dict",
+    ),
+    "fissix.fixes.fix_has_key": ("has_key",),
+    "fissix.fixes.fix_long": ("long",),
+    "fissix.fixes.fix_methodattrs": ("im_func", "im_self", "im_class"),
+    "fissix.fixes.fix_ne": ("<>",),
+    # Octal literals such as 0777, and long ones such as 10L or 0xffL.
+    "fissix.fixes.fix_numliterals": (re.compile(r"\b0\d|\b\d\w*[lL]\b"),),
+    "fissix.fixes.fix_operator": (
+        "isCallable",
+        "sequenceIncludes",
+        "isSequenceType",
+        "isMappingType",
+        "isNumberType",
+        "repeat",
+        "irepeat",
+    ),
+    "fissix.fixes.fix_paren": ("for",),
+    "fissix.fixes.fix_reduce": ("reduce",),
+    "fissix.fixes.fix_renames": ("maxint",),
+    "fissix.fixes.fix_repr": ("`",),
+    "fissix.fixes.fix_standarderror": ("StandardError",),
+    "fissix.fixes.fix_sys_exc": ("exc_type", "exc_value", "exc_traceback"),
+    "fissix.fixes.fix_throw": ("throw",),
+    "fissix.fixes.fix_tuple_params": ("def", "lambda"),
+    "fissix.fixes.fix_types": ("types",),
+    "fissix.fixes.fix_xreadlines": ("xreadlines",),
+    "libmodernize.fixes.fix_basestring": ("basestring",),
+    "libmodernize.fixes.fix_classic_division": ("/",),
+    "libmodernize.fixes.fix_dict_six": (
+        "keys",
+        "items",
+        "values",
+        "iterkeys",
+        "iteritems",
+        "itervalues",
+        "viewkeys",
+        "viewitems",
+        "viewvalues",
+    ),
+    "libmodernize.fixes.fix_file": ("file",),
+    "libmodernize.fixes.fix_filter": ("filter",),
+    "libmodernize.fixes.fix_import": ("import",),
+    # The keys of FixImportsSix.mapping.
+    "libmodernize.fixes.fix_imports_six": (
+        "BaseHTTPServer",
+        "CGIHTTPServer",
+        "ConfigParser",
+        "Cookie",
+        "Dialog",
+        "FileDialog",
+        "HTMLParser",
+        "Queue",
+        "ScrolledText",
+        "SimpleDialog",
+        "SimpleHTTPServer",
+        "SimpleXMLRPCServer",
+        "SocketServer",
+        "Tix",
+        "Tkconstants",
+        "Tkdnd",
+        "Tkinter",
+        "__builtin__",
+        "_winreg",
+        "cPickle",
+        "cookielib",
+        "copy_reg",
+        "dummy_thread",
+        "gdbm",
+        "htmlentitydefs",
+        "httplib",
+        "repr",
+        "robotparser",
+        "thread",
+        "tkColorChooser",
+        "tkCommonDialog",
+        "tkFileDialog",
+        "tkFont",
+        "tkMessageBox",
+        "tkSimpleDialog",
+        "ttk",
+        "urlparse",
+        "xmlrpclib",
+    ),
+    "libmodernize.fixes.fix_input_six": ("input", "raw_input"),
+    "libmodernize.fixes.fix_int_long_tuple": ("long",),
+    "libmodernize.fixes.fix_itertools_imports_six": ("itertools",),
+    "libmodernize.fixes.fix_itertools_six": (
+        "imap",
+        "ifilter",
+        "izip",
+        "izip_longest",
+        "ifilterfalse",
+    ),
+    "libmodernize.fixes.fix_map": ("map",),
+    "libmodernize.fixes.fix_metaclass": ("__metaclass__",),
+    "libmodernize.fixes.fix_next": ("next",),
+    # fix_execfile calls open().
+    "libmodernize.fixes.fix_open": ("open", "file", "execfile"),
+    "libmodernize.fixes.fix_print": ("print",),
+    "libmodernize.fixes.fix_raise": ("raise",),
+    "libmodernize.fixes.fix_raise_six": ("raise",),
+    "libmodernize.fixes.fix_unichr": ("unichr",),
+    "libmodernize.fixes.fix_unicode_type": ("unicode",),
+    # The keys of fix_urllib_six.MAPPING.
+    "libmodernize.fixes.fix_urllib_six": ("urllib", "urllib2"),
+    # fix_types replaces types.XRangeType by range.
+    "libmodernize.fixes.fix_xrange_six": ("range", "xrange", "XRangeType"),
+    "libmodernize.fixes.fix_zip": ("zip",),
+}
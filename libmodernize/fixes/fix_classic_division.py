@@ -7,6 +7,7 @@ import libmodernize
 
 
 class FixClassicDivision(fixer_base.BaseFix):
+    BM_compatible = True
     PATTERN = """
     '/=' | '/'
     """
@@ -15,9 +16,6 @@ class FixClassicDivision(fixer_base.BaseFix):
         super().start_tree(tree, name)
         self.skip = "division" in tree.future_features
 
-    def match(self, node):
-        return node.value in ("/", "/=")
-
     def transform(self, node, results):
         if self.skip:
             return
@@ -6,6 +6,7 @@ from libmodernize import touch_import
 
 
 class FixIntLongTuple(fixer_base.BaseFix):
+    BM_compatible = True
 
     run_order = 4  # Must run before fix_long.
 
@@ -154,8 +154,13 @@ def fixup_indent(suite):
 class FixMetaclass(fixer_base.BaseFix):
     BM_compatible = True
 
+    # The classes for which has_metaclass() is true, so that the bottom
+    # matcher only offers the classes containing a __metaclass__ leaf.
     PATTERN = """
-    classdef<any*>
+    classdef< any* suite< any* simple_stmt< expr_stmt< '__metaclass__' any* > any* >
+                          any* > >
+    |
+    classdef< any* simple_stmt< expr_stmt< '__metaclass__' any* > any* > >
     """
 
     def transform(self, node, results):
@@ -6,19 +6,24 @@ Python           _              _
 """
 
 
-import logging
+from __future__ import generator_stop
+
+import json
 import optparse
 import os
 import sys
 
-from fissix import refactor
-from fissix.main import StdoutRefactoringTool, warn
-
 from libmodernize import __version__
-from libmodernize.fixes import fissix_fix_names, opt_in_fix_names, six_fix_names
+from libmodernize.fixes import (
+    fissix_fix_names,
+    libmodernize_fix_names,
+    opt_in_fix_names,
+    six_fix_names,
+)
 
-import re
-import json
+# fissix, the fixers, the refactoring tools and the modules only needed by
+# some options are imported when they are used, which keeps e.g. --version
+# and --list-fixes fast.
 
 usage = (
     __doc__
@@ -31,36 +36,84 @@ Usage: modernize [options] file|dir ...
 )
 
 
-"""
-re-route stdout
-"""
-
-
-class ListStream:
-    def __init__(self):
-        self.data = {'result': {}, 'original_diff': ''}
+class NDJSONReport:
+    """Writes one JSON record per file and fixer as soon as a file is done.
 
-    def write(self, s):
-        self.data['original_diff'] += s
+    Only fixers that changed a file get a record; `summarize` writes a final
+    record with the totals of the run.
+    """
 
-    def __enter__(self):
-        sys.stdout = self
-        return self
+    def __init__(self, stream, findings=False, original_diff=False):
+        self.stream = stream
+        self.findings = findings
+        self.original_diff = original_diff
+        self.files = 0
+        self.changed_files = 0
+        self.fixers = {}
+        self.tracer = None
+
+    def __call__(self, filename, results):
+        self.files += 1
+        changed = False
+        for fixer, result in results.items():
+            if not result:
+                continue
+            changed = True
+            self.fixers[fixer] = self.fixers.get(fixer, 0) + 1
+            record = {"file": filename, "fixer": fixer}
+            if self.findings:
+                record["findings"] = [finding.to_record() for finding in result]
+            else:
+                from libmodernize.diffing import parse_unified_diff
+                from libmodernize.tracing import span
+
+                with span(
+                    self.tracer, "parse_unified_diff", file=filename, fixer=fixer
+                ):
+                    changes = parse_unified_diff(result.splitlines())
+                # The record is about a single file already.
+                record["result"] = changes.get(filename, {})
+                if self.original_diff:
+                    record["original_diff"] = result
+            self.write(record)
+        self.changed_files += changed
+        self.stream.flush()
+
+    def write(self, record):
+        self.stream.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def summarize(self, fixer_names, errors):
+        self.write(
+            {
+                "summary": {
+                    "files": self.files,
+                    "changed_files": self.changed_files,
+                    "errors": len(errors),
+                    "fixers": {
+                        fixer: self.fixers.get(fixer, 0)
+                        for fixer in sorted(fixer_names)
+                    },
+                }
+            }
+        )
+        self.stream.flush()
 
-    def __exit__(self, ext_type, exc_value, traceback):
-        sys.stdout = sys.__stdout__
 
+def warn(msg):
+    print(f"WARNING: {msg}", file=sys.stderr)
 
-final = {}
 
 def format_usage(usage):
     """Method that doesn't output "Usage:" prefix"""
     return usage
 
 
-def main(args=None):
+def main(args=None, tools=None):
     """Main program.
 
+    `tools`, if given, is a :class:`~libmodernize.daemon.ToolPool` of
+    refactoring tools that are reused instead of creating new ones.
+
     Returns a suggested exit status (0, 1, 2).
     """
     # Set up option parser
@@ -95,9 +148,9 @@ def main(args=None):
         "-j",
         "--processes",
         action="store",
-        default=1,
-        type="int",
-        help="Run fissix concurrently.",
+        default="1",
+        help="Run fissix concurrently in this many processes; 'auto' uses "
+        "one per CPU available, within the CPU quota of a container.",
     )
     parser.add_option(
         "-x",
@@ -148,16 +201,107 @@ def main(args=None):
         help="Returns non-zero exit code if any fixers had to be applied.  "
         "Useful for enforcing Python 3 compatibility.",
     )
+    parser.add_option(
+        "--check-only",
+        action="store_true",
+        default=False,
+        help="Only list the files that would be modified, without rendering "
+        "diffs; implies --enforce.",
+    )
+    parser.add_option(
+        "--fail-fast",
+        action="store_true",
+        default=False,
+        help="With --check-only, stop at the first file that would be modified.",
+    )
     parser.add_option(
         "--json",
         action="store_true",
         default=False,
         help="Returns violations per fixer in JSON format."
     )
+    parser.add_option(
+        "--ndjson",
+        action="store_true",
+        default=False,
+        help="Stream violations as one JSON record per file and fixer, "
+        "followed by a summary record.",
+    )
+    parser.add_option(
+        "--findings",
+        action="store_true",
+        default=False,
+        help="With --json or --ndjson, report the changes recorded by the fixers "
+        "(with their exact positions) instead of parsed diffs.",
+    )
+    parser.add_option(
+        "--original-diff",
+        action="store_true",
+        default=False,
+        help="With --json or --ndjson, include the diff of each fixer as "
+        "'original_diff' next to the parsed changes.",
+    )
+    parser.add_option(
+        "--since",
+        action="store",
+        metavar="REF",
+        default=None,
+        help="Only refactor the .py files (below the given files and directories, "
+        "if any) that git reports as added or modified since REF, or as "
+        "untracked and not ignored.",
+    )
+    parser.add_option(
+        "--cache-dir",
+        action="store",
+        default=None,
+        help="Cache the results for each file in this directory, so that files "
+        "that did not change since an earlier run are not refactored again "
+        "(not used with -w).",
+    )
+    parser.add_option(
+        "--cache-size",
+        action="store",
+        default=None,
+        type="int",
+        help="Maximum size of the --cache-dir cache in MiB (default: 256).",
+    )
+    parser.add_option(
+        "--profile-fixers",
+        action="store",
+        type="choice",
+        choices=["table", "json"],
+        metavar="FORMAT",
+        default=None,
+        help="Measure the time spent in each fixer and print it to stderr at the "
+        "end, as a 'table' or as 'json'. --cache-dir is ignored.",
+    )
+    parser.add_option(
+        "--trace",
+        action="store",
+        metavar="FILE",
+        default=None,
+        help="Write a trace of reading, parsing, fixing, diffing and writing "
+        "each file to FILE, in the Chrome trace event format.",
+    )
+    parser.add_option(
+        "--metrics-out",
+        action="store",
+        metavar="FILE",
+        default=None,
+        help="Write statistics of the run (files by outcome, throughput, "
+        "latency percentiles, peak RSS and worker utilisation) to FILE.",
+    )
+    parser.add_option(
+        "--metrics-format",
+        action="store",
+        type="choice",
+        choices=["json", "prometheus"],
+        default="json",
+        help="Format of --metrics-out: 'json' (the default) or 'prometheus' "
+        "(for the node exporter's textfile collector).",
+    )
 
-    fixer_pkg = "libmodernize.fixes"
-    avail_fixes = set(refactor.get_fixers_from_package(fixer_pkg))
-    avail_fixes.update(fissix_fix_names)
+    avail_fixes = libmodernize_fix_names | fissix_fix_names
 
     # Parse command line arguments
     refactor_stdin = False
@@ -167,6 +311,22 @@ def main(args=None):
         warn("Not writing files and not printing diffs; that's not very useful.")
     if not options.write and options.nobackups:
         parser.error("Can't use '-n' without '-w'.")
+    if options.write and (options.json or options.ndjson):
+        parser.error("Can't use '--json' or '--ndjson' with '-w'.")
+    if options.json and options.ndjson:
+        parser.error("Can't use '--json' with '--ndjson'.")
+    if options.findings and not (options.json or options.ndjson):
+        parser.error("Can't use '--findings' without '--json' or '--ndjson'.")
+    if options.original_diff and not (options.json or options.ndjson):
+        parser.error("Can't use '--original-diff' without '--json' or '--ndjson'.")
+    if options.original_diff and options.findings:
+        parser.error("Can't use '--original-diff' with '--findings'.")
+    if options.check_only and (options.write or options.json or options.ndjson):
+        parser.error("Can't use '--check-only' with '-w', '--json' or '--ndjson'.")
+    if options.fail_fast and not options.check_only:
+        parser.error("Can't use '--fail-fast' without '--check-only'.")
+    if options.check_only:
+        options.enforce = True
     if options.list_fixes:
         print(
             "Standard transformations available for the "
@@ -177,6 +337,8 @@ def main(args=None):
         print()
         if not args:
             return 0
+    if not args and options.since is not None:
+        args = [os.curdir]
     if not args:
         print("At least one file or directory argument required.", file=sys.stderr)
         print("Use --help to show usage.", file=sys.stderr)
@@ -186,14 +348,40 @@ def main(args=None):
         if options.write:
             print("Can't write to stdin.", file=sys.stderr)
             return 2
+    if options.since is not None:
+        import subprocess
+
+        if refactor_stdin:
+            parser.error("Can't use '--since' with '-'.")
+        try:
+            args = changed_python_files(options.since, args)
+        except OSError as err:
+            print(f"Can't run git: {err}", file=sys.stderr)
+            return 2
+        except subprocess.CalledProcessError as err:
+            print(err.stderr.strip(), file=sys.stderr)
+            return 2
+    if options.processes != "1":
+        from libmodernize.scheduler import parse_processes
+
+        try:
+            options.processes = parse_processes(options.processes)
+        except ValueError:
+            parser.error(f"invalid number of processes: {options.processes}")
+    else:
+        options.processes = 1
     if options.print_function:
         flags["print_function"] = True
-    if options.fixers_here:
+    if options.fixers_here and os.getcwd() not in sys.path:
+        # main() may run many times in a process, e.g. in modernize-daemon.
         sys.path.append(os.getcwd())
 
     # Set up logging handler
+    import logging
+
     level = logging.DEBUG if options.verbose else logging.INFO
-    logging.basicConfig(format="%(name)s: %(message)s", level=level)
+    logging.basicConfig(format="%(name)s: %(message)s")
+    logging.getLogger().setLevel(level)
 
     # Initialize the refactoring tool
     unwanted_fixes = set()
@@ -273,52 +461,302 @@ def main(args=None):
     print(file=sys.stderr)
 
     # Refactor all files and directories passed as arguments
-    if options.json:
-        list3 = sorted(fixer_names)
-
-        for n in list(list3):
-            lib23process([n], flags, explicit, options, refactor_stdin, args)
+    if options.check_only:
+        return check_process(
+            fixer_names, flags, explicit, options, refactor_stdin, args, tools
+        )
+    elif options.ndjson:
+        report = NDJSONReport(sys.stdout, options.findings, options.original_diff)
+        return json_process(
+            fixer_names, flags, explicit, options, refactor_stdin, args, report, tools
+        )
+    elif options.json:
+        results = {}
+        return_code = json_process(
+            fixer_names,
+            flags,
+            explicit,
+            options,
+            refactor_stdin,
+            args,
+            tools=tools,
+            results=results,
+        )
 
-        json_data = json.dumps(final)
+        json_data = json.dumps(results, separators=(",", ":"))
         print(json_data)
-        return
+        return return_code
     else:
-        return lib23process(fixer_names, flags, explicit, options, refactor_stdin, args)
+        return lib23process(
+            fixer_names, flags, explicit, options, refactor_stdin, args, tools
+        )
 
-def lib23process(fixer_names, flags, explicit, options, refactor_stdin, args):
-    rt = StdoutRefactoringTool(
-        sorted(fixer_names),
-        flags,
-        sorted(explicit),
-        options.nobackups,
-        not options.no_diffs,
-    )
-    has_diff = False
+
+def changed_python_files(ref, paths):
+    """Return the .py files below `paths` that were added or modified since `ref`,
+    or that git does not track yet (unless it ignores them).
+
+    The git repository of the current directory is asked for the files; they
+    are returned relative to the current directory.
+    """
+    import subprocess
+
+    def git(*args):
+        return subprocess.run(
+            ("git",) + args,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        ).stdout
+
+    top_level = git("rev-parse", "--show-toplevel").rstrip("\n")
+    # A ref such as "--output=x" is not taken for an option.
+    commit = git("rev-parse", "--verify", "--end-of-options", ref).rstrip("\n")
+    names = git(
+        "diff",
+        "--name-only",
+        "--no-renames",
+        "--diff-filter=AM",
+        "-z",
+        commit,
+        "--",
+        *paths,
+    ).split("\0")
+    # Like git diff, look at the whole repository if no paths are given.
+    names += git(
+        "ls-files",
+        "--others",
+        "--exclude-standard",
+        "--full-name",
+        "-z",
+        "--",
+        *(paths or [":/"]),
+    ).split("\0")
+    return [
+        os.path.relpath(os.path.join(top_level, name))
+        for name in names
+        if name.endswith(".py")
+    ]
+
+
+def lib23process(
+    fixer_names, flags, explicit, options, refactor_stdin, args, tools=None
+):
+    from fissix import refactor
+
+    from libmodernize.refactoring import DiffRefactoringTool
+
+    rt = make_tool(DiffRefactoringTool, fixer_names, flags, explicit, options, tools)
+    use_cache(rt, options)
+    use_profile(rt, options)
+    use_tracer(rt, options)
+    use_metrics(rt, options)
     if not rt.errors:
         if refactor_stdin:
             rt.refactor_stdin()
         else:
             try:
-                # to redirect the stdout
-                # to better detect FPs
-                with ListStream() as stream:
-                    # stream.data['fixer'] = fixer_names[0];
-                    rt.refactor(args, options.write, options.doctests_only,
-                                options.processes)
-                    if stream.data['original_diff']:
-                        has_diff = True
-                if options.json:
-                    final[fixer_names[0]] = process_unified_diff(stream.data)
-                else:
-                    print(stream.data['original_diff'])
+                rt.refactor(args, options.write, options.doctests_only,
+                            options.processes)
+            except refactor.MultiprocessingUnsupported:  # pragma: no cover
+                assert options.processes > 1
+                print("Sorry, -j isn't supported on this platform.", file=sys.stderr)
+                return 1
+        if rt.files and rt.has_diff:
+            rt.summarize()
+        report_profile(rt, options)
+        write_trace(rt, options)
+        write_metrics(rt, options)
+
+    return exit_status(rt, options, rt.has_diff)
+
+
+def check_process(
+    fixer_names, flags, explicit, options, refactor_stdin, args, tools=None
+):
+    """Print the names of the files that would be modified."""
+    from fissix import refactor
+
+    from libmodernize.refactoring import CheckRefactoringTool
 
+    rt = make_tool(CheckRefactoringTool, fixer_names, flags, explicit, options, tools)
+    rt.fail_fast = options.fail_fast
+    use_cache(rt, options)
+    use_profile(rt, options)
+    use_tracer(rt, options)
+    use_metrics(rt, options)
+    if not rt.errors:
+        if refactor_stdin:
+            rt.refactor_stdin(options.doctests_only)
+        else:
+            try:
+                rt.refactor(args, False, options.doctests_only, options.processes)
+            except refactor.MultiprocessingUnsupported:  # pragma: no cover
+                assert options.processes > 1
+                print("Sorry, -j isn't supported on this platform.", file=sys.stderr)
+                return 1
+        for filename in rt.changed_files:
+            print(filename)
+        report_profile(rt, options)
+        write_trace(rt, options)
+        write_metrics(rt, options)
+
+    return exit_status(rt, options, bool(rt.changed_files))
+
+
+def json_process(
+    fixer_names,
+    flags,
+    explicit,
+    options,
+    refactor_stdin,
+    args,
+    report=None,
+    tools=None,
+    results=None,
+):
+    """Refactor the files once, recording the changes of each fixer in `results`.
+
+    If `report` is given, the changes are passed to it file by file instead.
+    """
+    from fissix import refactor
+
+    from libmodernize.diffing import parse_unified_diff
+    from libmodernize.refactoring import (
+        FindingsRefactoringTool,
+        PerFixerRefactoringTool,
+    )
+    from libmodernize.tracing import span
+
+    tool_class = (
+        FindingsRefactoringTool if options.findings else PerFixerRefactoringTool
+    )
+    rt = make_tool(tool_class, fixer_names, flags, explicit, options, tools)
+    rt.file_reporter = report
+    use_cache(rt, options)
+    use_profile(rt, options)
+    use_tracer(rt, options)
+    use_metrics(rt, options)
+    if report is not None:
+        report.tracer = rt.tracer
+    has_diff = False
+    if not rt.errors:
+        if refactor_stdin:
+            rt.refactor_stdin(options.doctests_only)
+        else:
+            try:
+                rt.refactor(args, False, options.doctests_only, options.processes)
             except refactor.MultiprocessingUnsupported:  # pragma: no cover
                 assert options.processes > 1
                 print("Sorry, -j isn't supported on this platform.", file=sys.stderr)
                 return 1
+        if report is not None:
+            report.summarize(fixer_names, rt.errors)
+            has_diff = bool(report.changed_files)
+        elif options.findings:
+            results.update(rt.findings.to_json(fixer_names))
+            has_diff = bool(rt.findings)
+        else:
+            for fixer_name, diff_lines in rt.diffs.items():
+                has_diff = has_diff or bool(diff_lines)
+                with span(rt.tracer, "parse_unified_diff", fixer=fixer_name):
+                    results[fixer_name] = {"result": parse_unified_diff(diff_lines)}
+                if options.original_diff:
+                    results[fixer_name]["original_diff"] = "".join(diff_lines)
         if rt.files and has_diff:
             rt.summarize()
+        report_profile(rt, options)
+        write_trace(rt, options)
+        write_metrics(rt, options)
+
+    return exit_status(rt, options, has_diff)
+
+
+def make_tool(tool_class, fixer_names, flags, explicit, options, tools=None):
+    """Return a `tool_class` instance, from `tools` if given."""
+    args = (
+        sorted(fixer_names),
+        flags,
+        sorted(explicit),
+        options.nobackups,
+        not options.no_diffs,
+    )
+    if tools is not None:
+        return tools.get(tool_class, *args)
+    return tool_class(*args)
+
+
+def use_cache(rt, options):
+    """Set up the ``--cache-dir`` cache of ``rt``."""
+    # Cached files are not refactored, so there would be nothing to measure.
+    if options.cache_dir is not None and options.profile_fixers is None:
+        from libmodernize.cache import DEFAULT_MAX_SIZE, ResultCache
+
+        max_size = DEFAULT_MAX_SIZE
+        if options.cache_size is not None:
+            max_size = options.cache_size * 1024 * 1024
+        rt.cache = ResultCache(options.cache_dir, max_size)
+
 
+def use_profile(rt, options):
+    """Set up the ``--profile-fixers`` profile of ``rt``."""
+    if options.profile_fixers is not None:
+        from libmodernize.profiling import FixerProfile
+
+        rt.set_profile(FixerProfile())
+
+
+def report_profile(rt, options):
+    """Print the ``--profile-fixers`` profile of ``rt`` to stderr."""
+    if rt.profile is None:
+        return
+    if options.profile_fixers == "json":
+        print(json.dumps(rt.profile.to_json(), indent=2), file=sys.stderr)
+    else:
+        print(rt.profile.format_table(), file=sys.stderr)
+    rt.set_profile(None)
+
+
+def use_tracer(rt, options):
+    """Set up the ``--trace`` tracer of ``rt``."""
+    if options.trace is not None:
+        from libmodernize.tracing import Tracer
+
+        rt.set_tracer(Tracer())
+
+
+def write_trace(rt, options):
+    """Write the ``--trace`` trace of ``rt``."""
+    if rt.tracer is None:
+        return
+    try:
+        rt.tracer.write(options.trace)
+    except OSError as err:
+        print(f"Can't write trace to {options.trace}: {err}", file=sys.stderr)
+    rt.set_tracer(None)
+
+
+def use_metrics(rt, options):
+    """Set up the ``--metrics-out`` metrics of ``rt``."""
+    if options.metrics_out is not None:
+        from libmodernize.metrics import RunMetrics
+
+        rt.metrics = RunMetrics()
+
+
+def write_metrics(rt, options):
+    """Write the ``--metrics-out`` metrics of ``rt``."""
+    if rt.metrics is None:
+        return
+    try:
+        rt.metrics.write(options.metrics_out, options.metrics_format)
+    except OSError as err:
+        print(f"Can't write metrics to {options.metrics_out}: {err}", file=sys.stderr)
+    rt.metrics = None
+
+
+def exit_status(rt, options, has_diff):
     # Return error status (0 if rt.errors is zero)
     return_code = int(bool(rt.errors))
 
@@ -330,77 +768,22 @@ def lib23process(fixer_names, flags, explicit, options, refactor_stdin, args):
     return return_code
 
 
-'''
-This returns a json with the following format 
-{  
-   "libmodernize.fixes.fix_dict_six":{  
-      "result":{  
-         "@@ -1,4 +1,5 @@":{  
-            "2":"+import six\n"
-         },
-         "@@ -7,6 +8,6 @@":{  
-            "10":"-x.values()\n-x.itervalues()\n-x.viewvalues()\n+list(x.values())\n+six.itervalues(x)\n+six.viewvalues(x)\n"
+"""
+This returns a json with the following format, with the changes keyed by file,
+then by hunk. "original_diff" is only included with --original-diff.
+{
+   "libmodernize.fixes.fix_dict_six":{
+      "result":{
+         "printp3.py":{
+            "@@ -1,4 +1,5 @@":{
+               "2":"+import six\n"
+            },
+            "@@ -7,6 +8,6 @@":{
+               "10":"-x.values()\n-x.itervalues()\n-x.viewvalues()\n+list(x.values())\n+six.itervalues(x)\n+six.viewvalues(x)\n"
+            }
          }
       },
       "original_diff":"--- printp3.py\t(original)\n+++ printp3.py\t(refactored)\n@@ -1,4 +1,5 @@\n import ConfigParser\n..."
    }
 }
-'''
-
-
-def process_unified_diff(modernize_output):
-    original_diff = modernize_output['original_diff']
-    if original_diff:
-        # Get rid of the first two lines containing ---, +++
-        lines_with_hunk=re.search(r'(\@\@.*(?:\n.*)*)', original_diff, ).group(0)
-        lines = lines_with_hunk.split("\n")
-        line_num_minus = 0
-        line_num_plus = 0
-        suggested_fix = {}
-        context_line_num = 0
-
-        pat_diff = re.compile(r'@@\s\-([0-9]+\,?[0-9]*)\s\+([0-9]+\,?[0-9]*) @@') # get all except + and -1
-        for line in lines:
-            '''
-             if line.startswith('--') or line.startswith('++'):
-                 continue
-            Make the start of each hunk one group
-             In each hunk, when there is a contenxt line, make that the start of a sub-group
-             @@ -1,4 +1,5 @@
-             - x
-             + y
-             context
-            +xx
-            sub section 1 = -x +y
-             sub section 2 = +xx
-            '''
-            if line.startswith('@@'):
-                isfirsthit = False
-                hunkstart = line
-                left, right = pat_diff.match(line).group(1, 2) #groups
-                line_num_minus = int(left.split(',')[0])
-                line_num_plus = int(right.split(',')[0])
-                suggested_fix[hunkstart] = {}
-            elif line.startswith('+'):
-                if not isfirsthit:
-                    isfirsthit = True
-                    context_line_num = line_num_plus
-                    suggested_fix[hunkstart][context_line_num] = ''
-                suggested_fix[hunkstart][context_line_num] += line + "\n"
-                line_num_plus += 1
-            elif line.startswith('-'):
-                if not isfirsthit:
-                    isfirsthit = True
-                    context_line_num = line_num_minus
-                    suggested_fix[hunkstart][context_line_num] = ''
-                suggested_fix[hunkstart][context_line_num] += line + "\n"
-                line_num_minus += 1
-            elif line.startswith(' '):  # consider a context line as a start of a sub hunk
-                line_num_minus += 1
-                line_num_plus += 1
-                isfirsthit = False
-                context_line_num += 1
-
-        modernize_output['result'] = suggested_fix
-
-    return modernize_output
+"""
@@ -0,0 +1,245 @@
+"""Statistics of a run (``--metrics-out``).
+
+:class:`RunMetrics` collects the outcome, size and latency of every file
+that is refactored, in the process that refactors it, and summarizes them
+at the end of the run: how many files were scanned, changed, skipped
+without being parsed (because no fixer applies to them) or failed, the
+throughput, latency percentiles, the peak RSS and how busy each process
+was. The summary can be written as JSON or in the text format of the
+Prometheus node exporter's textfile collector.
+"""
+
+from __future__ import generator_stop
+
+import json
+import math
+import os
+import sys
+import time
+
+STATUSES = ("changed", "unchanged", "skipped", "failed")
+PERCENTILES = (50, 95, 99)
+
+
+def peak_rss():
+    """Return the peak RSS of this process in bytes, or None if unknown."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def percentile(ordered, percent):
+    """Return the ``percent`` percentile of the sorted list ``ordered``, by
+    the nearest-rank method."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(len(ordered) * percent / 100) - 1)]
+
+
+class RunMetrics:
+    """The per-file statistics of a run, and the peak RSS of its processes.
+
+    The wall time of the run is measured from the creation of the metrics.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        # (pid, status, cached, seconds, size) of every file.
+        self.files = []
+        self.peak_rss = {}
+
+    def file_done(self, size, seconds, result, outcome):
+        """Record a file of ``size`` bytes that took ``seconds`` (None if
+        unknown), given what the tool recorded for it and the tool's
+        ``file_outcome``."""
+        reports, files, errors, messages, wrote = result
+        if errors:
+            status = "failed"
+        elif files:
+            status = "changed"
+        elif outcome == "skipped":
+            status = "skipped"
+        else:
+            status = "unchanged"
+        self.files.append((os.getpid(), status, outcome == "cached", seconds, size))
+
+    def take(self):
+        """Return the statistics recorded so far and start over."""
+        files, self.files = self.files, []
+        return files, {os.getpid(): peak_rss()}
+
+    def merge(self, taken):
+        """Add the statistics of another process, as returned by
+        :meth:`take`."""
+        files, peak = taken
+        self.files.extend(files)
+        for pid, rss in peak.items():
+            if rss is not None:
+                self.peak_rss[pid] = max(rss, self.peak_rss.get(pid, 0))
+
+    def summary(self):
+        """Return the statistics of the run so far as a dictionary."""
+        self.merge(([], {os.getpid(): peak_rss()}))
+        wall = time.perf_counter() - self.start
+        counts = dict.fromkeys(STATUSES, 0)
+        busy = {}
+        latencies = []
+        size = cached = 0
+        for pid, status, was_cached, seconds, file_size in self.files:
+            counts[status] += 1
+            cached += was_cached
+            size += file_size
+            busy.setdefault(pid, [0, 0.0])
+            busy[pid][0] += 1
+            if seconds is not None:
+                latencies.append(seconds)
+                busy[pid][1] += seconds
+        latencies.sort()
+        scanned = len(self.files)
+        latency = {
+            f"p{percent}": percentile(latencies, percent) for percent in PERCENTILES
+        }
+        latency["max"] = latencies[-1] if latencies else None
+        return {
+            "timestamp": time.time(),
+            "duration_seconds": wall,
+            "files": dict(scanned=scanned, cached=cached, **counts),
+            "bytes": size,
+            "files_per_second": scanned / wall if wall else None,
+            "bytes_per_second": size / wall if wall else None,
+            "latency_seconds": latency,
+            "peak_rss_bytes": max(self.peak_rss.values(), default=None),
+            "workers": [
+                {
+                    "pid": pid,
+                    "files": files,
+                    "busy_seconds": seconds,
+                    "utilisation": seconds / wall if wall else None,
+                    "peak_rss_bytes": self.peak_rss.get(pid),
+                }
+                for pid, (files, seconds) in sorted(busy.items())
+            ],
+        }
+
+    def to_prometheus(self, summary):
+        """Return ``summary`` in the Prometheus text exposition format."""
+        lines = []
+
+        def metric(name, kind, description, samples):
+            samples = [
+                (labels, value) for labels, value in samples if value is not None
+            ]
+            if not samples:
+                return
+            lines.append(f"# HELP modernize_{name} {description}")
+            lines.append(f"# TYPE modernize_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                if label_text:
+                    label_text = "{" + label_text + "}"
+                lines.append(f"modernize_{name}{label_text} {value}")
+
+        files = summary["files"]
+        latency = summary["latency_seconds"]
+        workers = summary["workers"]
+        metric(
+            "last_run_timestamp_seconds",
+            "gauge",
+            "When the run ended, in seconds since the epoch.",
+            [((), summary["timestamp"])],
+        )
+        metric(
+            "run_duration_seconds",
+            "gauge",
+            "Wall time of the run.",
+            [((), summary["duration_seconds"])],
+        )
+        metric(
+            "files",
+            "gauge",
+            "Files scanned, by outcome.",
+            [((("status", status),), files[status]) for status in STATUSES],
+        )
+        metric(
+            "files_scanned",
+            "gauge",
+            "Files scanned.",
+            [((), files["scanned"])],
+        )
+        metric(
+            "files_cached",
+            "gauge",
+            "Files whose results were taken from the cache.",
+            [((), files["cached"])],
+        )
+        metric(
+            "bytes", "gauge", "Bytes of the files scanned.", [((), summary["bytes"])]
+        )
+        metric(
+            "files_per_second",
+            "gauge",
+            "Files scanned per second of wall time.",
+            [((), summary["files_per_second"])],
+        )
+        metric(
+            "file_latency_seconds",
+            "gauge",
+            "Time taken to refactor a file, by percentile.",
+            [
+                ((("quantile", str(percent / 100)),), latency[f"p{percent}"])
+                for percent in PERCENTILES
+            ]
+            + [((("quantile", "1"),), latency["max"])],
+        )
+        metric(
+            "peak_rss_bytes",
+            "gauge",
+            "Peak resident set size of the largest process of the run.",
+            [((), summary["peak_rss_bytes"])],
+        )
+        metric(
+            "worker_utilisation",
+            "gauge",
+            "Fraction of the wall time a process spent refactoring files.",
+            [
+                ((("worker", str(index)),), worker["utilisation"])
+                for index, worker in enumerate(workers)
+            ],
+        )
+        metric(
+            "worker_files",
+            "gauge",
+            "Files refactored by a process.",
+            [
+                ((("worker", str(index)),), worker["files"])
+                for index, worker in enumerate(workers)
+            ],
+        )
+        return "\n".join(lines) + "\n"
+
+    def write(self, filename, format="json"):
+        """Write the summary to ``filename`` as ``json`` or ``prometheus``.
+
+        The file is replaced atomically, so that a collector never reads a
+        partial file.
+        """
+        summary = self.summary()
+        if format == "prometheus":
+            text = self.to_prometheus(summary)
+        else:
+            text = json.dumps(summary, indent=2) + "\n"
+        temp_name = f"{filename}.{os.getpid()}.tmp"
+        try:
+            with open(temp_name, "w") as f:
+                f.write(text)
+            os.replace(temp_name, filename)
+        except OSError:
+            try:
+                os.remove(temp_name)
+            except OSError:
+                pass
+            raise
@@ -0,0 +1,58 @@
+"""Finding the fixers that may change a source without parsing it.
+
+A fixer only changes code that contains certain names, operators or
+literals, its triggers (see :data:`libmodernize.fixes.fixer_triggers`).
+Looking for those in the text of a file is much cheaper than parsing it, so
+the refactoring tools only apply the fixers whose triggers occur in a file,
+and do not parse a file at all if there are none. Triggers in strings and
+comments count as well, which is harmless: the fixer is applied but finds
+nothing to change.
+"""
+
+from __future__ import generator_stop
+
+import re
+
+from libmodernize.fixes import fixer_triggers
+
+_WORD = re.compile(r"\w+")
+
+
+class TriggerFilter:
+    """Tells which of ``fixers`` may change a source.
+
+    Fixers without known triggers may always change it.
+    """
+
+    def __init__(self, fixers):
+        self.fixers = list(fixers)
+        self.always = set()
+        self.words = {}
+        self.symbols = {}
+        self.patterns = {}
+        for fixer in self.fixers:
+            triggers = fixer_triggers.get(type(fixer).__module__)
+            if triggers is None:
+                self.always.add(fixer)
+                continue
+            for trigger in triggers:
+                if not isinstance(trigger, str):
+                    found_by = self.patterns
+                elif _WORD.fullmatch(trigger):
+                    found_by = self.words
+                else:
+                    found_by = self.symbols
+                found_by.setdefault(trigger, set()).add(fixer)
+
+    def fixers_for(self, source):
+        """Return the set of the fixers that may change ``source``."""
+        fixers = set(self.always)
+        for word in self.words.keys() & set(_WORD.findall(source)):
+            fixers |= self.words[word]
+        for symbol, symbol_fixers in self.symbols.items():
+            if symbol in source:
+                fixers |= symbol_fixers
+        for pattern, pattern_fixers in self.patterns.items():
+            if pattern.search(source):
+                fixers |= pattern_fixers
+        return fixers
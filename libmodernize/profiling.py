@@ -0,0 +1,175 @@
+"""Measuring the time spent in each fixer (``--profile-fixers``).
+
+A :class:`FixerProfile` wraps the ``match``, ``transform``, ``start_tree``
+and ``finish_tree`` methods of the fixers it instruments to time them and
+to count how many candidate nodes each fixer was offered, how many of them
+it matched and how often it transformed one. The time that
+:func:`libmodernize.add_future` and :func:`libmodernize.touch_import` take
+to insert imports is found through the ``fixer_profile`` attribute of the
+tree; it is charged to the fixer that inserts them and not counted as part
+of its other methods.
+"""
+
+from __future__ import generator_stop
+
+import time
+from contextlib import contextmanager
+
+METHODS = ("match", "transform", "start_tree", "finish_tree")
+TIMES = ("match", "transform", "start_tree", "finish_tree", "imports")
+COUNTS = ("candidates", "matches", "transforms")
+
+
+class FixerStats:
+    """The times (in seconds) and counts measured for one fixer."""
+
+    __slots__ = TIMES + COUNTS
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    @property
+    def total(self):
+        return sum(getattr(self, name) for name in TIMES)
+
+    def merge(self, other):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def to_json(self):
+        data = {f"{name}_seconds": round(getattr(self, name), 6) for name in TIMES}
+        data["total_seconds"] = round(self.total, 6)
+        data.update((name, getattr(self, name)) for name in COUNTS)
+        return data
+
+
+class FixerProfile:
+    """The :class:`FixerStats` of the instrumented fixers, by fixer name."""
+
+    def __init__(self):
+        self.stats = {}
+        # The stats of the fixer whose method is running, if any.
+        self._current = None
+        self._instrumented = []
+
+    def instrument(self, fixers):
+        """Wrap the methods of ``fixers`` to measure them."""
+        for fixer in fixers:
+            stats = self.stats.setdefault(type(fixer).__module__, FixerStats())
+            saved = {name: fixer.__dict__.get(name) for name in METHODS}
+            self._instrumented.append((fixer, saved))
+            fixer.match = self._timed_match(stats, fixer.match)
+            for name in METHODS[1:]:
+                setattr(fixer, name, self._timed(stats, name, getattr(fixer, name)))
+
+    def uninstrument(self):
+        """Restore the methods of the instrumented fixers."""
+        for fixer, saved in self._instrumented:
+            for name, method in saved.items():
+                if method is None:
+                    del fixer.__dict__[name]
+                else:
+                    setattr(fixer, name, method)
+        self._instrumented = []
+
+    def _timed_match(self, stats, match):
+        clock = time.perf_counter
+
+        def timed_match(node):
+            start = clock()
+            results = match(node)
+            stats.match += clock() - start
+            stats.candidates += 1
+            if results:
+                stats.matches += 1
+            return results
+
+        return timed_match
+
+    def _timed(self, stats, name, method):
+        clock = time.perf_counter
+
+        def timed(*args):
+            outer, self._current = self._current, stats
+            imports = stats.imports
+            start = clock()
+            try:
+                return method(*args)
+            finally:
+                elapsed = clock() - start
+                self._current = outer
+                # The time spent inserting imports is counted separately.
+                elapsed -= stats.imports - imports
+                setattr(stats, name, getattr(stats, name) + elapsed)
+                if name == "transform":
+                    stats.transforms += 1
+
+        return timed
+
+    @contextmanager
+    def inserting_imports(self):
+        """Charge the time of the block to the running fixer as ``imports``."""
+        stats = self._current
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if stats is not None:
+                stats.imports += time.perf_counter() - start
+
+    def take(self):
+        """Return the stats measured so far and start over."""
+        taken = {}
+        for name, stats in self.stats.items():
+            taken[name] = FixerStats()
+            taken[name].merge(stats)
+            # The wrappers hold on to the stats objects they update.
+            stats.clear()
+        return taken
+
+    def merge(self, stats):
+        """Add ``stats``, as returned by :meth:`take`, to this profile."""
+        for name, fixer_stats in stats.items():
+            self.stats.setdefault(name, FixerStats()).merge(fixer_stats)
+
+    def sorted_stats(self):
+        """Return the (fixer name, stats) pairs, most time consuming first."""
+        return sorted(self.stats.items(), key=lambda item: (-item[1].total, item[0]))
+
+    def to_json(self):
+        return {name: stats.to_json() for name, stats in self.sorted_stats()}
+
+    def format_table(self):
+        """Return the stats as a table, most time consuming fixer first."""
+        header = (
+            "fixer",
+            "total ms",
+            "match ms",
+            "transform ms",
+            "start ms",
+            "finish ms",
+            "imports ms",
+            "candidates",
+            "matches",
+            "transforms",
+        )
+        rows = [header]
+        for name, stats in self.sorted_stats():
+            times = (stats.total,) + tuple(getattr(stats, field) for field in TIMES)
+            rows.append(
+                (name,)
+                + tuple(f"{seconds * 1000:.1f}" for seconds in times)
+                + tuple(str(getattr(stats, count)) for count in COUNTS)
+            )
+        widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+        return "\n".join(
+            "  ".join(
+                [row[0].ljust(widths[0])]
+                + [cell.rjust(width) for cell, width in zip(row[1:], widths[1:])]
+            )
+            for row in rows
+        )
@@ -0,0 +1,1003 @@
+"""Refactoring tools used by the ``modernize`` command line."""
+
+from __future__ import generator_stop
+
+import io
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import time
+import tokenize
+from itertools import chain
+
+from fissix import fixer_base, refactor
+from fissix.main import StdoutRefactoringTool, warn
+
+from libmodernize import __version__
+from libmodernize.diffing import diff_texts
+from libmodernize.findings import Finding, FindingCollection, node_position, node_text
+from libmodernize.fixer_cache import headnode_dict, setup_fixers
+from libmodernize.prefilter import TriggerFilter
+from libmodernize.scheduler import schedule
+from libmodernize.tracing import span
+
+# The most combinations of fixers kept by ModernizeRefactoringTool.restricted().
+MAX_RESTRICTED = 64
+
+
+class ModernizeRefactoringTool(StdoutRefactoringTool):
+    """Base class of the modernize refactoring tools.
+
+    Subclasses implement :meth:`refactor_input` to refactor the source of a
+    single file and pass whatever they produced for it to
+    :meth:`report_file`; :meth:`file_done` then receives it in the parent
+    process.
+
+    With more than one process (``-j``) the files are refactored by worker
+    processes. The files are collected first and handed to the workers in
+    chunks, largest first (see :mod:`libmodernize.scheduler`). Instead of
+    printing, a worker sends the reports of each file, together with the
+    files, errors and fixer warnings it recorded, back to the parent through
+    a result queue, where they are merged in the order in which they arrive.
+
+    The same record of a file is what ``cache``, a
+    :class:`~libmodernize.cache.ResultCache`, stores for it: a file whose
+    contents did not change since an earlier run with the same settings is
+    not parsed again, its recorded reports are replayed instead.
+
+    Only the fixers that ``trigger_filter`` finds may change a source are
+    applied to it, and a source that none of them may change is not parsed
+    at all (so it is not reported if it cannot be parsed either).
+
+    With a ``profile`` (see :meth:`set_profile`) the fixers are measured
+    while they are applied, with a ``tracer`` (see :meth:`set_tracer`) the
+    phases of refactoring each file are recorded, and with ``metrics`` (a
+    :class:`~libmodernize.metrics.RunMetrics`) the outcome and latency of
+    each file. Workers send what these measured back with the results of
+    every chunk of files (see :data:`MEASUREMENTS`).
+    """
+
+    # The attributes that collect measurements; each has a take() method,
+    # whose result workers send to the parent, and a merge() method.
+    MEASUREMENTS = ("profile", "tracer", "metrics")
+
+    def __init__(
+        self, fixer_names, options=None, explicit=None, nobackups=False, show_diffs=True
+    ):
+        # The fixers are set up by setup_fixers(), from the fixer cache if
+        # possible, instead of by RefactoringTool.__init__().
+        super().__init__([], options, explicit, nobackups, show_diffs)
+        self.fixers = fixer_names
+        setup_fixers(self)
+        self.trigger_filter = TriggerFilter(chain(self.pre_order, self.post_order))
+        self.active_fixers = None
+        self._restricted = {}
+        self.result_queue = None
+        self.scheduled = None
+        self.pending = 0
+        self.file_reports = None
+        self.cache = None
+        self._cache_context = None
+        self.profile = None
+        self.tracer = None
+        self.metrics = None
+        # "skipped" or "cached" if the current file was not parsed.
+        self.file_outcome = None
+        # The size in bytes of the current file, once read.
+        self.file_size = 0
+
+    def reset(self):
+        """Forget the results of the files refactored so far.
+
+        This allows a tool, with its fixers and their compiled patterns, to
+        be reused for another run.
+        """
+        self.files = []
+        self.errors = []
+        # The fixers hold on to this list.
+        del self.fixer_log[:]
+        self.wrote = False
+        self.cache = None
+        self.set_profile(None)
+        self.set_tracer(None)
+        self.metrics = None
+
+    def fixer_instances(self):
+        """Return the fixers this tool applies."""
+        return list(chain(self.pre_order, self.post_order))
+
+    def set_profile(self, profile):
+        """Measure the fixers into ``profile``, a
+        :class:`~libmodernize.profiling.FixerProfile`, or stop measuring them
+        if it is None."""
+        if self.profile is not None:
+            self.profile.uninstrument()
+        self.profile = profile
+        if profile is not None:
+            profile.instrument(self.fixer_instances())
+
+    def set_tracer(self, tracer):
+        """Record the phases of refactoring each file with ``tracer``, a
+        :class:`~libmodernize.tracing.Tracer`, or stop recording them if it
+        is None."""
+        self.tracer = tracer
+        # Parsing is timed at the driver, which RefactoringTool.refactor_string
+        # and refactor_docstring both end up in.
+        self.driver.__dict__.pop("parse_tokens", None)
+        if tracer is not None:
+            parse_tokens = self.driver.parse_tokens
+
+            def traced_parse_tokens(*args, **kwargs):
+                with tracer.span("parse"):
+                    return parse_tokens(*args, **kwargs)
+
+            self.driver.parse_tokens = traced_parse_tokens
+
+    def refactor(self, items, write=False, doctests_only=False, num_processes=1):
+        if num_processes == 1:
+            return refactor.RefactoringTool.refactor(self, items, write, doctests_only)
+        try:
+            import multiprocessing
+        except ImportError:  # pragma: no cover
+            raise refactor.MultiprocessingUnsupported
+        if self.queue is not None:
+            raise RuntimeError("already doing multiple processes")
+        self.queue = multiprocessing.JoinableQueue()
+        self.result_queue = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=self._child) for i in range(num_processes)
+        ]
+        try:
+            for p in processes:
+                p.start()
+            self.scheduled = []
+            refactor.RefactoringTool.refactor(self, items, write, doctests_only)
+            for chunk in schedule(self.scheduled, num_processes):
+                self.queue.put(((chunk, write, doctests_only), {}))
+                self.pending += 1
+            self.collect_results(processes)
+        except BaseException:
+            # Do not wait for the workers to get through the queued files.
+            for p in processes:
+                if p.is_alive():
+                    p.terminate()
+            raise
+        else:
+            self.queue.join()
+            for i in range(num_processes):
+                self.queue.put(None)
+        finally:
+            for p in processes:
+                if p.is_alive():
+                    p.join()
+            self.queue = self.result_queue = self.scheduled = None
+            self.pending = 0
+
+    def _child(self):
+        task = self.queue.get()
+        while task is not None:
+            args, kwargs = task
+            try:
+                self.result_queue.put(self.refactor_in_worker(*args, **kwargs))
+            finally:
+                self.queue.task_done()
+            task = self.queue.get()
+
+    def refactor_in_worker(self, filenames, write=False, doctests_only=False):
+        """Refactor files in a worker process and return what was recorded
+        for each of them, and what was measured meanwhile."""
+        results = []
+        with span(self.tracer, "chunk", files=len(filenames)):
+            for filename in filenames:
+                files = len(self.files)
+                errors, messages = len(self.errors), len(self.fixer_log)
+                try:
+                    result = self.measure_file(filename, write, doctests_only)
+                except Exception as err:
+                    self.log_error(
+                        "Can't refactor %s: %s: %s",
+                        filename,
+                        err.__class__.__name__,
+                        err,
+                    )
+                    result = self.record_file([], files, errors, messages)
+                    if self.metrics is not None:
+                        self.metrics.file_done(self.file_size, None, result, None)
+                results.append(result)
+        measured = {}
+        for name in self.MEASUREMENTS:
+            measurement = getattr(self, name)
+            if measurement is not None:
+                measured[name] = measurement.take()
+        return results, measured
+
+    def collect_results(self, processes):
+        """Merge the results of all dispatched chunks into this tool, as the
+        worker ``processes`` send them."""
+        while self.pending:
+            try:
+                results, measured = self.result_queue.get(timeout=1)
+            except queue.Empty:
+                if not any(p.is_alive() for p in processes):
+                    raise RuntimeError("all worker processes died")
+                continue
+            self.pending -= 1
+            for name, measurement in measured.items():
+                getattr(self, name).merge(measurement)
+            for result in results:
+                self.merge_result(result)
+
+    def merge_result(self, result):
+        """Merge what :meth:`record_file` returned into this tool."""
+        reports, files, errors, messages, wrote = result
+        self.files.extend(files)
+        self.errors.extend(errors)
+        self.fixer_log.extend(messages)
+        self.wrote = self.wrote or wrote
+        for filename, report in reports:
+            self.file_done(filename, report)
+
+    def refactor_file(self, filename, write=False, doctests_only=False):
+        """Refactors a file, or schedules it for the worker processes."""
+        if self.scheduled is not None:
+            self.scheduled.append(filename)
+        else:
+            self.merge_result(self.measure_file(filename, write, doctests_only))
+
+    def measure_file(self, filename, write=False, doctests_only=False):
+        """Like :meth:`_refactor_file`, but records the span of the file and
+        its metrics too."""
+        self.file_outcome = None
+        self.file_size = 0
+        start = time.perf_counter()
+        with span(self.tracer, "file", file=filename):
+            result = self._refactor_file(filename, write, doctests_only)
+        if self.metrics is not None:
+            self.metrics.file_done(
+                self.file_size,
+                time.perf_counter() - start,
+                result,
+                self.file_outcome,
+            )
+        return result
+
+    def _refactor_file(self, filename, write=False, doctests_only=False):
+        """Refactors a file in this process and returns what it recorded.
+
+        Unless the file is written back, the result is looked up in and
+        stored to ``self.cache``, keyed by the file's name and contents and
+        by the settings of this tool.
+        """
+        files, errors, messages = len(self.files), len(self.errors), len(self.fixer_log)
+        reports = []
+        key = None
+        input, encoding = self._read_python_source(filename)
+        # input is None if reading the file failed.
+        if input is not None:
+            input += "\n"  # Silence certain parse errors
+            if self.cache is not None and not write:
+                key = self.cache.key(
+                    self.cache_context(), filename, str(doctests_only), input
+                )
+                result = self.cache.get(key)
+                if result is not None:
+                    self.log_debug("Using cached results for %s", filename)
+                    self.file_outcome = "cached"
+                    return result
+            self.file_reports = reports
+            try:
+                self.refactor_input(input, filename, write, doctests_only, encoding)
+            finally:
+                self.file_reports = None
+        result = self.record_file(reports, files, errors, messages)
+        if key is not None:
+            self.cache.put(key, result)
+        return result
+
+    def record_file(self, reports, files, errors, messages):
+        """Return ``reports`` with the files, errors and fixer warnings
+        recorded after the given counts, and remove those from this tool.
+
+        The result is passed to :meth:`merge_result` in the parent process.
+        """
+        result = (
+            reports,
+            self.files[files:],
+            # Format the errors, their arguments need not be picklable.
+            [(msg % args, (), {}) for msg, args, kwargs in self.errors[errors:]],
+            self.fixer_log[messages:],
+            self.wrote,
+        )
+        del self.files[files:], self.errors[errors:], self.fixer_log[messages:]
+        return result
+
+    def cache_context(self):
+        """Return the part of the cache keys that depends on the settings."""
+        if self._cache_context is None:
+            self._cache_context = repr(
+                (
+                    __version__,
+                    type(self).__name__,
+                    sorted(self.fixers),
+                    sorted(self.explicit),
+                    sorted(self.options.items()),
+                    self.show_diffs,
+                )
+            )
+        return self._cache_context
+
+    def _read_python_source(self, filename):
+        """Read and decode a Python source file, reading it only once."""
+        try:
+            with span(self.tracer, "read", file=filename):
+                with open(filename, "rb") as f:
+                    data = f.read()
+        except OSError as err:
+            self.log_error("Can't open %s: %s", filename, err)
+            return None, None
+        self.file_size = len(data)
+        with span(self.tracer, "decode", file=filename):
+            encoding = tokenize.detect_encoding(io.BytesIO(data).readline)[0]
+            return data.decode(encoding), encoding
+
+    def write_file(self, new_text, filename, old_text, encoding):
+        """Replace the file with ``new_text``, atomically.
+
+        The new contents are written to a temporary file, which is then
+        renamed to ``filename``. The backup, unless disabled, is a hard
+        link to the old file where possible. If ``filename`` is a symbolic
+        link, the file it points to is replaced, and backed up, instead.
+        """
+        with span(self.tracer, "write", file=filename):
+            if self._output_dir or self._append_suffix:
+                return super().write_file(new_text, filename, old_text, encoding)
+            data = new_text.encode(encoding or "utf-8")
+            path = os.path.realpath(filename)
+            directory, name = os.path.split(path)
+            try:
+                fd, temp_name = tempfile.mkstemp(
+                    prefix=f".{name}.", suffix=".tmp", dir=directory or None
+                )
+            except OSError as err:
+                self.log_error("Can't create %s: %s", filename, err)
+                return
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                shutil.copymode(path, temp_name)
+                if not self.nobackups:
+                    self.backup_file(path)
+                os.replace(temp_name, path)
+            except OSError as err:
+                self.log_error("Can't write %s: %s", filename, err)
+                try:
+                    os.remove(temp_name)
+                except OSError:
+                    pass
+                return
+            self.log_debug("Wrote changes to %s", filename)
+            self.wrote = True
+
+    def backup_file(self, filename):
+        """Keep the current contents of ``filename`` as ``filename.bak``."""
+        backup = filename + ".bak"
+        if os.path.lexists(backup):
+            try:
+                os.remove(backup)
+            except OSError:
+                self.log_message("Can't remove backup %s", backup)
+        try:
+            os.link(filename, backup)
+        except OSError:
+            try:
+                shutil.copy2(filename, backup)
+            except OSError:
+                self.log_message("Can't copy %s to %s", filename, backup)
+
+    def refactor_stdin(self, doctests_only=False):
+        input = sys.stdin.read() + "\n"
+        self.refactor_input(input, "<stdin>", False, doctests_only)
+
+    def refactor_input(
+        self, input, name, write=False, doctests_only=False, encoding=None
+    ):
+        """Refactors ``input``, the source of ``name`` with a \\n appended."""
+        raise NotImplementedError
+
+    def refactor_string(self, data, name):
+        """Like ``RefactoringTool.refactor_string``, but returns None without
+        parsing ``data`` if none of the fixers may change it."""
+        self.active_fixers = self.trigger_filter.fixers_for(data)
+        try:
+            if not self.active_fixers:
+                self.log_debug("No fixer applies to %s", name)
+                self.file_outcome = "skipped"
+                return None
+            return super().refactor_string(data, name)
+        finally:
+            self.active_fixers = None
+
+    def refactor_docstring(self, input, filename):
+        self.active_fixers = self.trigger_filter.fixers_for(input)
+        try:
+            if not self.active_fixers:
+                self.file_outcome = "skipped"
+                return input
+            return super().refactor_docstring(input, filename)
+        finally:
+            self.active_fixers = None
+
+    def refactor_tree(self, tree, name):
+        """Applies the fixers to ``tree``, only those in ``active_fixers``
+        if that is set."""
+        if self.profile is not None:
+            tree.fixer_profile = self.profile
+        active = self.active_fixers
+        if active is None or len(active) == len(self.trigger_filter.fixers):
+            with span(self.tracer, "fixers", file=name):
+                return super().refactor_tree(tree, name)
+        all_fixers = (
+            self.pre_order,
+            self.post_order,
+            self.BM,
+            self.bmi_pre_order_heads,
+            self.bmi_post_order_heads,
+        )
+        (
+            self.pre_order,
+            self.post_order,
+            self.BM,
+            self.bmi_pre_order_heads,
+            self.bmi_post_order_heads,
+        ) = self.restricted(frozenset(active))
+        try:
+            with span(self.tracer, "fixers", file=name):
+                return super().refactor_tree(tree, name)
+        finally:
+            (
+                self.pre_order,
+                self.post_order,
+                self.BM,
+                self.bmi_pre_order_heads,
+                self.bmi_post_order_heads,
+            ) = all_fixers
+
+    def restricted(self, fixers):
+        """Return the fixer orders, bottom matcher and traversal heads used
+        by ``refactor_tree``, with only the fixers in ``fixers``."""
+        state = self._restricted.get(fixers)
+        if state is None:
+            if len(self._restricted) >= MAX_RESTRICTED:
+                self._restricted.clear()
+            state = (
+                [fixer for fixer in self.pre_order if fixer in fixers],
+                [fixer for fixer in self.post_order if fixer in fixers],
+                _RestrictedMatcher(self.BM, fixers),
+                headnode_dict(
+                    [fixer for fixer in self.bmi_pre_order if fixer in fixers]
+                ),
+                headnode_dict(
+                    [fixer for fixer in self.bmi_post_order if fixer in fixers]
+                ),
+            )
+            self._restricted[fixers] = state
+        return state
+
+    def report_file(self, filename, report):
+        """Pass the results for a file on to :meth:`file_done`."""
+        if self.file_reports is not None:
+            self.file_reports.append((filename, report))
+        else:
+            self.file_done(filename, report)
+
+    def file_done(self, filename, report):
+        """Called in the parent process with the results for a file."""
+        raise NotImplementedError
+
+
+class _RestrictedMatcher:
+    """A bottom matcher that only reports the matches of ``fixers``."""
+
+    def __init__(self, matcher, fixers):
+        self.matcher = matcher
+        self.fixers = [fixer for fixer in matcher.fixers if fixer in fixers]
+
+    def run(self, leaves):
+        matches = self.matcher.run(leaves)
+        return {fixer: matches[fixer] for fixer in self.fixers if fixer in matches}
+
+
+class DiffRefactoringTool(ModernizeRefactoringTool):
+    """Refactoring tool that writes the diffs of all fixers to ``output``.
+
+    ``has_diff`` tells whether any file would actually change, which is not
+    the same as a fixer having touched the parse tree of a file.
+    """
+
+    def __init__(self, *args, output=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._output = output
+        self.has_diff = False
+
+    @property
+    def output(self):
+        """The stream for the diffs, the current ``sys.stdout`` by default."""
+        return sys.stdout if self._output is None else self._output
+
+    def reset(self):
+        super().reset()
+        self.has_diff = False
+
+    def refactor_input(
+        self, input, name, write=False, doctests_only=False, encoding=None
+    ):
+        if doctests_only:
+            self.log_debug("Refactoring doctests in %s", name)
+            output = self.refactor_docstring(input, name)
+            if self.write_unchanged_files or output != input:
+                self.processed_file(output, name, input, write, encoding)
+            else:
+                self.log_debug("No doctest changes in %s", name)
+        else:
+            tree = self.refactor_string(input, name)
+            if self.write_unchanged_files or (tree and tree.was_changed):
+                # The [:-1] is to take off the \n we added earlier
+                self.processed_file(
+                    str(tree)[:-1], name, input[:-1], write=write, encoding=encoding
+                )
+            else:
+                self.log_debug("No changes in %s", name)
+
+    def print_output(self, old, new, filename, equal):
+        if equal:
+            self.log_message("No changes to %s", filename)
+        else:
+            self.log_message("Refactored %s", filename)
+            diff = ""
+            if self.show_diffs:
+                with span(self.tracer, "diff", file=filename):
+                    diff = "".join(
+                        line + "\n" for line in diff_texts(old, new, filename)
+                    )
+            self.report_file(filename, diff)
+
+    def file_done(self, filename, diff):
+        self.has_diff = True
+        try:
+            self.output.write(diff)
+        except UnicodeEncodeError:
+            warn("couldn't encode %s's diff for your terminal" % (filename,))
+
+
+class _StopRefactoring(Exception):
+    """Raised to stop refactoring any further files."""
+
+
+class CheckRefactoringTool(ModernizeRefactoringTool):
+    """Refactoring tool that only finds out which files would change.
+
+    Nothing is rendered or written: the names of the files whose refactored
+    source differs from the original are collected in ``changed_files``.
+    With ``fail_fast`` set, no further files are refactored once one was
+    found to change.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.changed_files = []
+        self.fail_fast = False
+
+    def reset(self):
+        super().reset()
+        self.changed_files = []
+        self.fail_fast = False
+
+    def refactor(self, items, write=False, doctests_only=False, num_processes=1):
+        try:
+            super().refactor(items, write, doctests_only, num_processes)
+        except _StopRefactoring:
+            pass
+
+    def refactor_stdin(self, doctests_only=False):
+        try:
+            super().refactor_stdin(doctests_only)
+        except _StopRefactoring:
+            pass
+
+    def refactor_input(
+        self, input, name, write=False, doctests_only=False, encoding=None
+    ):
+        if doctests_only:
+            self.log_debug("Refactoring doctests in %s", name)
+            changed = self.refactor_docstring(input, name) != input
+        else:
+            tree = self.refactor_string(input, name)
+            # A fixer may touch the tree without changing the source.
+            changed = tree is not None and tree.was_changed and str(tree) != input
+        if changed:
+            self.files.append(name)
+            self.log_message("Refactored %s", name)
+            self.report_file(name, True)
+        else:
+            self.log_debug("No changes in %s", name)
+
+    def file_done(self, filename, changed):
+        """Called with the name of every file that would change."""
+        self.changed_files.append(filename)
+        if self.fail_fast:
+            raise _StopRefactoring
+
+
+class _FixerTool(refactor.RefactoringTool):
+    """Applies a single fixer on behalf of a :class:`PerFixerRefactoringTool`."""
+
+    def __init__(self, parent, fixer_name):
+        self.parent = parent
+        super().__init__([], parent.options, parent.explicit)
+        self.fixers = [fixer_name]
+        setup_fixers(self)
+        # Collect the warnings of every fixer in one place for summarize().
+        for fixer in chain(self.pre_order, self.post_order):
+            fixer.log = parent.fixer_log
+
+    def log_error(self, msg, *args, **kwargs):
+        self.parent.log_error(msg, *args, **kwargs)
+
+
+class PerFixerRefactoringTool(ModernizeRefactoringTool):
+    """Refactoring tool that records the changes of every fixer separately.
+
+    Each file is read and parsed only once. Every fixer is then applied in
+    isolation to its own copy of the parse tree, so the diff recorded for a
+    fixer is the same as the one produced by running modernize with only
+    that fixer selected. Only the fixers that match the tree are applied
+    (see :meth:`matching_tools`).
+
+    The diffs are collected per fixer in ``self.diffs`` instead of being
+    printed. If ``file_reporter`` is set, it is instead called with the name
+    of every processed file and a mapping of fixer name to diff text as soon
+    as that file is done.
+    """
+
+    def __init__(self, fixer_names, options, explicit, nobackups, show_diffs):
+        super().__init__([], options, explicit, nobackups, show_diffs)
+        # These fixers are only matched against the trees, by
+        # matching_tools(); each fixer is applied by its own tool.
+        self.fixers = sorted(fixer_names)
+        setup_fixers(self)
+        self.fixer_tools = {
+            fixer_name: _FixerTool(self, fixer_name)
+            for fixer_name in sorted(fixer_names)
+        }
+        self.trigger_filter = TriggerFilter(self.fixer_instances())
+        self.diffs = {fixer_name: [] for fixer_name in self.fixer_tools}
+        self.file_reporter = None
+
+    def reset(self):
+        super().reset()
+        self.diffs = {fixer_name: [] for fixer_name in self.fixer_tools}
+        self.file_reporter = None
+
+    def fixer_instances(self):
+        return [
+            fixer
+            for tool in self.fixer_tools.values()
+            for fixer in chain(tool.pre_order, tool.post_order)
+        ]
+
+    def refactor_input(
+        self, input, name, write=False, doctests_only=False, encoding=None
+    ):
+        diffs = {}
+        active = self.trigger_filter.fixers_for(input)
+        tools = {
+            fixer_name: tool
+            for fixer_name, tool in self.fixer_tools.items()
+            if not active.isdisjoint(chain(tool.pre_order, tool.post_order))
+        }
+        if doctests_only:
+            self.log_debug("Refactoring doctests in %s", name)
+            for fixer_name, tool in tools.items():
+                output = tool.refactor_docstring(input, name)
+                if output != input:
+                    self.processed_fixer(diffs, fixer_name, output, name, input)
+        else:
+            tree = self.refactor_string(input, name)
+            if tree is not None:
+                self.refactor_fixers(diffs, tree, name, input, tools)
+        self.report_file(name, diffs)
+
+    def refactor_tree(self, tree, name):
+        """Leaves the tree alone; see :meth:`refactor_fixers`."""
+        return False
+
+    def refactor_fixers(self, diffs, tree, name, input, tools=None):
+        """Applies every fixer (of ``tools``, by default all) to its own copy
+        of ``tree``. The last one is applied to ``tree`` itself, which is
+        unusable afterwards."""
+        if tools is None:
+            tools = self.fixer_tools
+        with span(self.tracer, "fixers", file=name):
+            self._refactor_fixers(diffs, tree, name, input, tools)
+
+    def matching_tools(self, tree, name, tools):
+        """Return those of ``tools`` whose fixer may change ``tree``.
+
+        A fixer only changes a tree where it matches it, so the fixers are
+        all matched against ``tree`` in a single pass, with the bottom
+        matcher and traversal heads of this tool, and those that match no
+        node would leave their copy of the tree unchanged. Fixers that
+        override ``finish_tree`` may change a tree anyway, and are kept.
+        """
+        matched = {
+            fixer_name
+            for fixer_name, tool in tools.items()
+            if any(
+                type(fixer).finish_tree is not fixer_base.BaseFix.finish_tree
+                for fixer in chain(tool.pre_order, tool.post_order)
+            )
+        }
+        # The fixers are named after their modules, see setup_fixers().
+        names = {
+            fixer: type(fixer).__module__
+            for fixer in chain(self.pre_order, self.post_order)
+            if type(fixer).__module__ in tools and type(fixer).__module__ not in matched
+        }
+        for fixer in names:
+            fixer.start_tree(tree, name)
+        for fixer, nodes in self.BM.run(tree.leaves()).items():
+            if fixer in names and any(fixer.match(node) for node in nodes):
+                matched.add(names.pop(fixer))
+        pre_order_heads = self.bmi_pre_order_heads
+        post_order_heads = self.bmi_post_order_heads
+        if any(not fixer.BM_compatible for fixer in names):
+            for node in tree.pre_order():
+                for fixer in chain(
+                    pre_order_heads.get(node.type, ()),
+                    post_order_heads.get(node.type, ()),
+                ):
+                    if fixer in names and fixer.match(node):
+                        matched.add(names.pop(fixer))
+        return {
+            fixer_name: tool
+            for fixer_name, tool in tools.items()
+            if fixer_name in matched
+        }
+
+    def _refactor_fixers(self, diffs, tree, name, input, tools):
+        tools = list(self.matching_tools(tree, name, tools).items())
+        for index, (fixer_name, tool) in enumerate(tools, 1):
+            if index < len(tools):
+                fixer_tree = tree.clone()
+                fixer_tree.future_features = tree.future_features
+                fixer_tree.used_names = set(tree.used_names)
+            else:
+                # matching_tools() ran the bottom matcher over this tree, which
+                # skips the nodes it has checked before.
+                for node in tree.pre_order():
+                    node.was_checked = False
+                fixer_tree = tree
+            if self.profile is not None:
+                fixer_tree.fixer_profile = self.profile
+            if tool.refactor_tree(fixer_tree, name):
+                # The [:-1] is to take off the \n we added earlier
+                new_text = str(fixer_tree)[:-1]
+                self.processed_fixer(diffs, fixer_name, new_text, name, input[:-1])
+            _release(fixer_tree)
+        if not tools:
+            _release(tree)
+
+    def processed_fixer(self, diffs, fixer_name, new_text, filename, old_text):
+        """Called when a fixer has been applied and there may be changes."""
+        if self.files[-1:] != [filename]:
+            self.files.append(filename)
+        if old_text == new_text:
+            self.log_debug("No changes to %s by %s", filename, fixer_name)
+            return
+        self.log_message("Refactored %s with %s", filename, fixer_name)
+        if self.show_diffs:
+            with span(self.tracer, "diff", file=filename, fixer=fixer_name):
+                diffs[fixer_name] = [
+                    line + "\n" for line in diff_texts(old_text, new_text, filename)
+                ]
+
+    def file_done(self, filename, diffs):
+        """Called with the diff lines of each fixer once a file is done."""
+        if self.file_reporter is not None:
+            self.file_reporter(
+                filename,
+                {fixer_name: "".join(lines) for fixer_name, lines in diffs.items()},
+            )
+        else:
+            for fixer_name, lines in diffs.items():
+                self.diffs[fixer_name].extend(lines)
+
+
+def _release(tree):
+    """Break the reference cycles between the nodes of ``tree``.
+
+    A parse tree is then freed as soon as it is no longer used, instead of
+    piling up until the garbage collector, whose collections take longer
+    the more of them there are, gets around to it.
+    """
+    nodes = [tree]
+    while nodes:
+        node = nodes.pop()
+        node.parent = None
+        nodes.extend(node.children)
+
+
+def _child_index(parent, child):
+    for index, node in enumerate(parent.children):
+        if node is child:
+            return index
+    raise ValueError("node is not a child of its parent")  # pragma: no cover
+
+
+class FindingsRefactoringTool(ModernizeRefactoringTool):
+    """Refactoring tool that records findings instead of rendering diffs.
+
+    All fixers are applied to a single parse tree of every file. Each fixer's
+    ``transform`` is wrapped so that the node it matched and the text that
+    replaced it end up as a :class:`~libmodernize.findings.Finding` in
+    ``self.findings``, located at the node's position in the original file.
+    The ``original`` of a finding is the node's text before any fixer changed
+    it, while its ``replacement`` includes the changes of the fixers applied
+    to the node before. Statements that a transformation inserted at the top
+    of the module (such as imports) are recorded as findings with an empty
+    ``original``.
+
+    If ``file_reporter`` is set, it is called with the name of every
+    processed file and a mapping of fixer name to that file's findings as
+    soon as the file is done, and ``self.findings`` stays empty.
+    """
+
+    def __init__(self, fixer_names, options, explicit, nobackups, show_diffs):
+        super().__init__(sorted(fixer_names), options, explicit, nobackups, show_diffs)
+        self.findings = FindingCollection()
+        self.file_findings = FindingCollection()
+        self.file_reporter = None
+        self._tree = None
+        self._name = None
+        self._inserted = set()
+        self._originals = {}
+        for fixer in chain(self.pre_order, self.post_order):
+            fixer.transform = self.recording_transform(fixer)
+
+    def reset(self):
+        super().reset()
+        self.findings = FindingCollection()
+        self.file_findings = FindingCollection()
+        self.file_reporter = None
+
+    def refactor_input(
+        self, input, name, write=False, doctests_only=False, encoding=None
+    ):
+        """Records the findings for a file without writing or diffing it."""
+        self.file_findings = FindingCollection()
+        if doctests_only:
+            self.log_debug("Refactoring doctests in %s", name)
+            self.refactor_docstring(input, name)
+        else:
+            self.refactor_string(input, name)
+        if self.file_findings:
+            self.files.append(name)
+            self.log_message("Refactored %s", name)
+        else:
+            self.log_debug("No changes in %s", name)
+        self.report_file(name, self.file_findings)
+
+    def file_done(self, filename, findings):
+        """Called with the findings of a file once it is done."""
+        if self.file_reporter is not None:
+            self.file_reporter(filename, findings.by_fixer())
+        else:
+            # Findings from the cache and the worker processes come with
+            # their own copies of the fixer and file names.
+            self.findings.extend(
+                finding._replace(
+                    fixer=sys.intern(finding.fixer),
+                    filename=sys.intern(finding.filename),
+                )
+                for finding in findings
+            )
+
+    def refactor_tree(self, tree, name):
+        self._tree, self._name = tree, name
+        self._inserted.clear()
+        try:
+            return super().refactor_tree(tree, name)
+        finally:
+            self._tree = self._name = None
+            self._originals.clear()
+
+    def original(self, node):
+        """Return the position and text of ``node`` before any fixer changed
+        it.
+
+        A transformation changes the text of the ancestors of its node as
+        well, so their original text is kept for the fixers that transform
+        them later.
+        """
+        ancestor = node
+        while ancestor is not None and id(ancestor) not in self._originals:
+            # The node is kept as well, so that its id is not reused.
+            self._originals[id(ancestor)] = (
+                ancestor,
+                node_position(ancestor),
+                node_text(ancestor),
+            )
+            ancestor = ancestor.parent
+        _, position, text = self._originals[id(node)]
+        return position, text
+
+    def recording_transform(self, fixer):
+        """Wrap ``fixer.transform`` to record what it changes."""
+        transform = fixer.transform
+        # get_fixers() loads the Fix* class from the module named by the fixer.
+        fixer_name = type(fixer).__module__
+
+        def record_transform(node, results):
+            tree = self._tree
+            top_level = len(tree.children)
+            parent = node.parent
+            if parent is not None:
+                index = _child_index(parent, node)
+                siblings = parent.children
+                previous = siblings[index - 1] if index else None
+                following = siblings[index + 1] if index + 1 < len(siblings) else None
+            (line, column), original = self.original(node)
+
+            new = transform(node, results)
+
+            if new is not None:
+                replacement = node_text(new)
+            elif parent is None or node.parent is parent:
+                replacement = node_text(node)
+            else:
+                # The node replaced itself, possibly by several nodes.
+                siblings = parent.children
+                start = 0 if previous is None else _child_index(parent, previous) + 1
+                end = (
+                    len(siblings)
+                    if following is None
+                    else _child_index(parent, following)
+                )
+                replacement = node_text(*siblings[start:end])
+            recorded = len(self.file_findings)
+            if replacement != original:
+                self.record(fixer_name, line, column, original, replacement)
+            if len(tree.children) != top_level:
+                self.record_insertions(fixer_name)
+                if len(self.file_findings) == recorded:
+                    # Only moved or removed statements; still report the match.
+                    self.record(fixer_name, line, column, original, replacement)
+            return new
+
+        return record_transform
+
+    def record(self, fixer_name, line, column, original, replacement):
+        self.file_findings.add(
+            Finding(fixer_name, self._name, line, column, original, replacement)
+        )
+
+    def record_insertions(self, fixer_name):
+        """Record the new statements at the top level of the current tree.
+
+        Inserted statements are recognized by not having a position in the
+        original source; they are reported at the line of the next original
+        statement.
+        """
+        inserted = []
+        line = None
+        for stmt in reversed(self._tree.children):
+            lineno = next((leaf.lineno for leaf in stmt.leaves() if leaf.lineno), 0)
+            if lineno:
+                line = lineno
+            elif id(stmt) not in self._inserted and line is not None:
+                self._inserted.add(id(stmt))
+                inserted.append((line, node_text(stmt)))
+        for line, text in reversed(inserted):
+            self.record(fixer_name, line, 0, "", text)
@@ -0,0 +1,115 @@
+"""Distributing files over worker processes (``-j``).
+
+The files are handed out largest first, so that a big file found last does
+not keep one worker busy while the others are idle, and small files are
+batched into chunks, so that the workers do not spend their time waiting
+for the next file.
+"""
+
+from __future__ import generator_stop
+
+import math
+import os
+
+# Aim for this many chunks per process, so that the chunks at the end are
+# small enough to even out the work of the processes.
+CHUNKS_PER_PROCESS = 8
+# Refactoring a few KiB of source takes long enough to not be dominated by
+# the round trip to a worker.
+MIN_CHUNK_SIZE = 4 * 1024
+MAX_CHUNK_FILES = 64
+
+
+def _read_first_line(path):
+    try:
+        with open(path) as f:
+            return f.readline().split()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit():
+    """Return the number of CPUs the CPU quota of our cgroup allows, or None.
+
+    Both cgroup v2 (``cpu.max``) and v1 (``cpu.cfs_quota_us``) are
+    supported.
+    """
+    fields = _read_first_line("/sys/fs/cgroup/cpu.max")
+    if fields and len(fields) == 2 and fields[0] != "max":
+        quota, period = fields
+    else:
+        quota = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+        period = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if not quota or not period:
+            return None
+        quota, period = quota[0], period[0]
+    try:
+        quota, period = int(quota), int(period)
+    except ValueError:
+        return None
+    if quota <= 0 or period <= 0:
+        return None
+    return max(1, math.ceil(quota / period))
+
+
+def available_cpus():
+    """Return the number of CPUs this process may use.
+
+    That is the number of CPUs it may run on, limited by the CPU quota of a
+    container it runs in.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, limit)
+    return cpus
+
+
+def parse_processes(value):
+    """Return the number of processes for the ``-j`` value ``value``.
+
+    ``auto`` means :func:`available_cpus`. Raises ValueError for anything
+    but ``auto`` or a positive number.
+    """
+    if value == "auto":
+        return available_cpus()
+    processes = int(value)
+    if processes < 1:
+        raise ValueError(f"invalid number of processes: {value}")
+    return processes
+
+
+def schedule(filenames, num_processes):
+    """Return ``filenames`` in chunks to hand to ``num_processes`` workers.
+
+    The files are ordered by size, largest first; files smaller than the
+    chunk size are batched together.
+    """
+    sizes = {}
+    for filename in filenames:
+        try:
+            sizes[filename] = os.path.getsize(filename)
+        except OSError:
+            # Reading it will fail and be reported by the worker.
+            sizes[filename] = 0
+    ordered = sorted(filenames, key=sizes.__getitem__, reverse=True)
+    chunk_size = max(
+        MIN_CHUNK_SIZE,
+        sum(sizes.values()) // (num_processes * CHUNKS_PER_PROCESS),
+    )
+    chunks = []
+    chunk = []
+    size = 0
+    for filename in ordered:
+        chunk.append(filename)
+        size += sizes[filename]
+        if size >= chunk_size or len(chunk) == MAX_CHUNK_FILES:
+            chunks.append(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
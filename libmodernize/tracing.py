@@ -0,0 +1,105 @@
+"""Recording the phases of a run as a trace (``--trace``).
+
+A :class:`Tracer` records spans, such as reading, parsing or fixing a file,
+as Chrome trace events, which can be loaded into ``chrome://tracing`` or
+https://ui.perfetto.dev. Every span is tagged with the process that
+recorded it, so that the work of the ``-j`` workers shows up side by side.
+The timestamps are taken from :func:`time.perf_counter`, which is the same
+clock in all processes of a run.
+"""
+
+from __future__ import generator_stop
+
+import json
+import os
+import time
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        pid = os.getpid()
+        self.tracer.events.append(
+            {
+                "name": self.name,
+                "cat": "modernize",
+                "ph": "X",
+                "ts": round(self.start * 1e6, 3),
+                "dur": round((end - self.start) * 1e6, 3),
+                "pid": pid,
+                "tid": pid,
+                "args": self.args,
+            }
+        )
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(tracer, name, **args):
+    """Return a context manager that records the span ``name`` with
+    ``tracer``, or does nothing if ``tracer`` is None."""
+    if tracer is None:
+        return _NO_SPAN
+    return _Span(tracer, name, args)
+
+
+class Tracer:
+    """The trace events recorded so far."""
+
+    def __init__(self):
+        self.events = []
+
+    def span(self, name, **args):
+        """Return a context manager that records the span ``name``."""
+        return _Span(self, name, args)
+
+    def take(self):
+        """Return the events recorded so far and start over."""
+        events, self.events = self.events, []
+        return events
+
+    def merge(self, events):
+        """Add ``events``, as returned by :meth:`take`, to this trace."""
+        self.events.extend(events)
+
+    def to_json(self):
+        """Return the trace in the Chrome trace event format."""
+        pid = os.getpid()
+        pids = sorted({event["pid"] for event in self.events} | {pid})
+        metadata = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": event_pid,
+                "tid": event_pid,
+                "args": {
+                    "name": "modernize" if event_pid == pid else f"worker {event_pid}"
+                },
+            }
+            for event_pid in pids
+        ]
+        return {"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}
+
+    def write(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.to_json(), f)
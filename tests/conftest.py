@@ -0,0 +1,20 @@
+from __future__ import generator_stop
+
+import os
+
+import pytest
+
+from libmodernize.fixer_cache import CACHE_ENV
+
+
+@pytest.fixture(autouse=True, scope="session")
+def fixer_cache_dir(tmp_path_factory):
+    """Keep the fixer cache of the tests out of the user's cache directory."""
+    directory = tmp_path_factory.mktemp("fixer_cache")
+    old = os.environ.get(CACHE_ENV)
+    os.environ[CACHE_ENV] = str(directory)
+    yield directory
+    if old is None:
+        del os.environ[CACHE_ENV]
+    else:
+        os.environ[CACHE_ENV] = old
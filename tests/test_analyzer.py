@@ -0,0 +1,70 @@
+from __future__ import generator_stop
+
+import threading
+
+from libmodernize.analyzer import Analyzer
+from libmodernize.findings import Finding
+
+FIXERS = ["libmodernize.fixes.fix_basestring", "libmodernize.fixes.fix_xrange_six"]
+
+
+def test_analyze_source():
+    analyzer = Analyzer(FIXERS)
+    result = analyzer.analyze_source("isinstance(x, basestring)\n", "a.py")
+    assert result.filename == "a.py"
+    assert result.errors == result.warnings == []
+    finding = Finding(
+        "libmodernize.fixes.fix_basestring",
+        "a.py",
+        1,
+        14,
+        "basestring",
+        "six.string_types",
+    )
+    assert finding in result.findings
+    assert analyzer.analyze_source("a = 1\n").findings == []
+
+
+def test_analyze_reuses_tool_without_leaking(tmp_path):
+    (tmp_path / "a.py").write_text("for i in xrange(3): pass\n")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.py").write_text("basestring = (\n")
+    (tmp_path / ".hidden").mkdir()
+    (tmp_path / ".hidden" / "c.py").write_text("xrange(1)\n")
+    analyzer = Analyzer(FIXERS)
+    tool = analyzer._tool()
+    results = list(analyzer.analyze(str(tmp_path)))
+    assert [result.filename for result in results] == [
+        str(tmp_path / "a.py"),
+        str(tmp_path / "sub" / "b.py"),
+    ]
+    assert {f.fixer for f in results[0].findings} == {
+        "libmodernize.fixes.fix_xrange_six"
+    }
+    assert results[0].errors == []
+    assert results[1].findings == []
+    assert len(results[1].errors) == 1
+    # The tool was reused and kept nothing of the previous calls.
+    assert analyzer._tool() is tool
+    assert list(tool.findings) == tool.errors == tool.files == []
+    assert analyzer.analyze_file(str(tmp_path / "a.py")) == results[0]
+
+
+def test_analyze_from_threads():
+    analyzer = Analyzer(FIXERS)
+    sources = [f"x{i} = xrange({i})\n" for i in range(20)]
+    expected = [analyzer.analyze_source(source) for source in sources]
+    results = {}
+    tools = set()
+
+    def work(index):
+        tools.add(id(analyzer._tool()))
+        results[index] = [analyzer.analyze_source(source) for source in sources]
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(tools) == 4
+    assert all(result == expected for result in results.values())
@@ -0,0 +1,48 @@
+from __future__ import generator_stop
+
+import os
+
+from libmodernize.cache import ResultCache
+
+
+def test_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = cache.key("context", "name.py", "a = 1\n")
+    assert key != cache.key("context", "name.py", "a = 2\n")
+    assert key != cache.key("contextname.py", "", "a = 1\n")
+    assert cache.get(key) is None
+    cache.put(key, ([("name.py", "diff")], ["name.py"], [], [], False))
+    assert cache.get(key) == ([("name.py", "diff")], ["name.py"], [], [], False)
+
+
+def test_corrupt_entry(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = cache.key("a")
+    cache.put(key, "value")
+    with open(os.path.join(str(tmp_path), key[:2], key), "wb") as f:
+        f.write(b"garbage")
+    assert cache.get(key) is None
+
+
+def test_prune(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    keys = [cache.key(str(i)) for i in range(20)]
+    for i, key in enumerate(keys):
+        cache.put(key, "x" * 1000)
+        path = os.path.join(str(tmp_path), key[:2], key)
+        os.utime(path, (i, i))
+    # Reading an entry marks it as recently used.
+    assert cache.get(keys[0]) == "x" * 1000
+    cache = ResultCache(str(tmp_path), max_size=10000)
+    cache.prune()
+    remaining = [key for key in keys if cache.get(key) is not None]
+    assert keys[0] in remaining
+    assert keys[1] not in remaining
+    assert keys[-1] in remaining
+    assert (
+        sum(
+            os.path.getsize(os.path.join(str(tmp_path), key[:2], key))
+            for key in remaining
+        )
+        <= 9000
+    )
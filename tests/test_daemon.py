@@ -0,0 +1,113 @@
+from __future__ import generator_stop
+
+import json
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+from libmodernize.daemon import Daemon, ToolPool, request
+from libmodernize.refactoring import DiffRefactoringTool
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="requires Unix domain sockets"
+)
+
+SAMPLE = "a = range(10)\n"
+
+
+def test_tool_pool_reuses_tools():
+    pool = ToolPool()
+    fixers = ["libmodernize.fixes.fix_xrange_six"]
+    tool = pool.get(DiffRefactoringTool, fixers, {}, [], False, True)
+    tool.files.append("sample.py")
+    tool.has_diff = True
+    assert pool.get(DiffRefactoringTool, fixers, {}, [], False, True) is tool
+    assert tool.files == [] and not tool.has_diff
+    flags = {"print_function": True}
+    assert pool.get(DiffRefactoringTool, fixers, flags, [], False, True) is not tool
+    assert len(pool) == 2
+
+
+def test_daemon_run(tmp_path):
+    (tmp_path / "sample.py").write_text(SAMPLE)
+    daemon = Daemon(str(tmp_path / "daemon.sock"))
+    for _ in range(2):
+        status, out, err = daemon.run(["--enforce", "sample.py"], str(tmp_path))
+        assert status == 2
+        assert "+a = list(range(10))" in out
+    assert len(daemon.tools) == 1
+    status, out, err = daemon.run(["--json", "-"], str(tmp_path), stdin=SAMPLE)
+    assert status == 0
+    assert "list(range(10))" in out
+    status, out, err = daemon.run(["--bogus"], str(tmp_path))
+    assert status == 2
+    assert "no such option: --bogus" in err
+    path_length = len(sys.path)
+    for _ in range(2):
+        daemon.run(["--fixers-here", "sample.py"], str(tmp_path))
+    assert sys.path.count(str(tmp_path)) == 1
+    del sys.path[path_length:]
+
+
+def test_daemon_malformed_request(tmp_path):
+    daemon = Daemon(str(tmp_path / "daemon.sock"))
+    stdin, cwd = sys.stdin, os.getcwd()
+    client, conn = socket.socketpair()
+    with client, conn:
+        payload = {"args": "sample.py", "cwd": str(tmp_path)}
+        client.sendall(json.dumps(payload).encode("utf-8"))
+        client.shutdown(socket.SHUT_WR)
+        daemon.handle(conn)
+        conn.close()
+        response = json.loads(client.makefile().read())
+    assert response["status"] == 1
+    assert "TypeError" in response["stderr"]
+    # The daemon is left as it was, ready for the next request.
+    assert sys.stdin is stdin
+    assert os.getcwd() == cwd
+
+
+def test_request(tmp_path, monkeypatch):
+    (tmp_path / "sample.py").write_text(SAMPLE)
+    path = str(tmp_path / "daemon.sock")
+    assert request(path, ["sample.py"]) is None
+    daemon = Daemon(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+
+    def serve_one():
+        conn, _ = server.accept()
+        with conn:
+            daemon.handle(conn)
+
+    thread = threading.Thread(target=serve_one)
+    thread.start()
+    monkeypatch.chdir(tmp_path)
+    try:
+        status, out, err = request(path, ["--enforce", "sample.py"])
+    finally:
+        thread.join()
+        server.close()
+    assert status == 2
+    assert "+a = list(range(10))" in out
+
+
+def test_request_untrusted_socket(tmp_path):
+    path = str(tmp_path / "daemon.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    # Fail instead of waiting for a response that never comes.
+    socket.setdefaulttimeout(5)
+    try:
+        # Anyone could have put a socket in a directory that all may write to.
+        tmp_path.chmod(0o777)
+        assert request(path, ["sample.py"]) is None
+    finally:
+        socket.setdefaulttimeout(None)
+        tmp_path.chmod(0o700)
+        server.close()
@@ -0,0 +1,72 @@
+from __future__ import generator_stop
+
+import difflib
+
+from fissix.main import diff_texts as difflib_diff_texts
+
+from libmodernize import diffing
+
+
+def patch(lines, diff):
+    """Apply the unified ``diff`` to ``lines``."""
+    result = []
+    position = 0
+    for line in diff[2:]:
+        if line.startswith("@@"):
+            old_range = line.split()[1][1:].split(",")
+            start = int(old_range[0])
+            if len(old_range) == 1 or old_range[1] != "0":
+                start -= 1
+            result.extend(lines[position:start])
+            position = start
+        elif line[0] == "+":
+            result.append(line[1:])
+        else:
+            assert lines[position] == line[1:]
+            if line[0] == " ":
+                result.append(line[1:])
+            position += 1
+    return result + lines[position:]
+
+
+def test_same_as_difflib():
+    old = "".join(f"line {i}\n" for i in range(200))
+    new = old.replace("line 3\n", "").replace("line 100\n", "line 100\nnew\n")
+    new = "import six\n" + new.replace("line 199\n", "last line\n")
+    diff = list(diffing.diff_texts(old, new, "a.py"))
+    assert diff == list(difflib_diff_texts(old, new, "a.py"))
+    assert len([line for line in diff if line.startswith("@@")]) == 3
+    assert list(diffing.diff_texts(old, old, "a.py")) == []
+
+
+def test_diff_applies(monkeypatch):
+    # Small windows, so that some changes are compared a window at a time.
+    monkeypatch.setattr(diffing, "FIRST_WINDOW", 2)
+    monkeypatch.setattr(diffing, "MAX_WINDOW", 4)
+    old = [str(i % 7) for i in range(100)]
+    cases = [
+        [line + "!" if i % 2 else line for i, line in enumerate(old)],
+        [line for i, line in enumerate(old) if i % 3],
+        ["x"] + old[10:50] + ["y", "z"] + old[50:],
+        [],
+        old[:40] + [line + "!" for line in old[40:]],
+    ]
+    for new in cases:
+        diff = list(diffing.unified_diff(old, new, "a", "b"))
+        assert patch(old, diff) == new
+        assert len(diff) <= len(list(difflib.unified_diff(old, new, lineterm="")))
+    assert patch([], list(diffing.unified_diff([], old))) == old
+
+
+def test_parse_unified_diff():
+    first = list(diffing.diff_texts("-- a\n++ b\nc\n", "x\n++ b\nc\ny", "a.py"))
+    second = list(diffing.diff_texts("a\nb", "import six\na\nb", "b.py"))
+    lines = first + second + ["\\ No newline at end of file"]
+    assert lines[2:4] == ["@@ -1,3 +1,4 @@", "--- a"]
+    assert diffing.parse_unified_diff(line + "\n" for line in lines) == {
+        "a.py": {"@@ -1,3 +1,4 @@": {1: "--- a\n+x\n", 4: "+y\n"}},
+        "b.py": {"@@ -1,2 +1,3 @@": {1: "+import six\n"}},
+    }
+    assert diffing.parse_unified_diff(["@@ -1 +1 @@", "-a", "+b"]) == {
+        None: {"@@ -1 +1 @@": {1: "-a\n+b\n"}}
+    }
@@ -2,6 +2,8 @@ from __future__ import generator_stop
 
 from utils import check_on_input
 
+from libmodernize.refactoring import DiffRefactoringTool
+
 METACLASS_NO_BASE = (
     """\
 class Foo:
@@ -103,3 +105,30 @@ def test_metaclass_one_liner():
 
 def test_metaclass_semicolon_stmt():
     check_on_input(*METACLASS_SEMICOLON_STMT)
+
+
+def test_metaclass_matched_classes():
+    tool = DiffRefactoringTool(["libmodernize.fixes.fix_metaclass"])
+    tree = tool.driver.parse_string(
+        """\
+class Plain(Base):
+    x = 1
+class Nested:
+    if x:
+        __metaclass__ = Meta
+class Foo:
+    __metaclass__ = Meta
+class Bar: x = 1; __metaclass__ = Meta
+class Baz: __metaclass__ = Meta
+"""
+    )
+    [fixer] = tool.post_order
+    candidates = sorted(
+        tool.BM.run(tree.leaves())[fixer], key=lambda node: node.get_lineno()
+    )
+    # Only classes with a __metaclass__ statement are looked at.
+    assert [str(node.children[1]) for node in candidates] == [" Foo", " Bar", " Baz"]
+    assert [str(node.children[1]) for node in candidates if fixer.match(node)] == [
+        " Foo",
+        " Baz",
+    ]
@@ -1,7 +1,10 @@
 from __future__ import generator_stop
 
+from fissix import fixer_util
 from utils import check_on_input
 
+from libmodernize.refactoring import DiffRefactoringTool
+
 UNICODE_LITERALS = """\
 a = u''
 b = U"\\u2041"
@@ -54,3 +57,19 @@ def test_unicode_future():
     check_on_input(
         UNICODE_LITERALS, UNICODE_LITERALS_future, extra_flags=["--future-unicode"]
     )
+
+
+def test_unicode_six_searches_import_once(monkeypatch):
+    searches = []
+    does_tree_import = fixer_util.does_tree_import
+
+    def counting_does_tree_import(package, name, node):
+        searches.append((package, name))
+        return does_tree_import(package, name, node)
+
+    monkeypatch.setattr(fixer_util, "does_tree_import", counting_does_tree_import)
+    tool = DiffRefactoringTool(["libmodernize.fixes.fix_unicode"])
+    source = "".join(f"a{i} = u'{i}'\n" for i in range(20)) + "import six\n"
+    tree = tool.refactor_string(source, "sample.py")
+    assert str(tree).count("six.u(") == 20
+    assert searches == [(None, "six")]
@@ -0,0 +1,46 @@
+from __future__ import generator_stop
+
+from libmodernize import fixer_cache
+from libmodernize.refactoring import FindingsRefactoringTool
+
+FIXERS = [
+    "fissix.fixes.fix_ws_comma",
+    "libmodernize.fixes.fix_print",
+    "libmodernize.fixes.fix_urllib_six",
+    "libmodernize.fixes.fix_xrange_six",
+]
+
+SAMPLE = """\
+import urllib2
+print 'hello', xrange(3)
+"""
+
+
+def _findings(tool):
+    tool.refactor_input(SAMPLE + "\n", "sample.py")
+    return sorted(tool.findings)
+
+
+def test_fixers_loaded_from_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv(fixer_cache.CACHE_ENV, str(tmp_path))
+    tool = FindingsRefactoringTool(FIXERS, {}, [], False, True)
+    expected = _findings(tool)
+    assert expected
+
+    def build_fixers(tool):
+        raise AssertionError("fixers set up again")
+
+    monkeypatch.setattr(fixer_cache, "build_fixers", build_fixers)
+    cached = FindingsRefactoringTool(FIXERS, {}, [], False, True)
+    assert [type(f) for f in cached.pre_order + cached.post_order] == [
+        type(f) for f in tool.pre_order + tool.post_order
+    ]
+    assert all(f.options is cached.options for f in cached.post_order)
+    assert _findings(cached) == expected
+
+
+def test_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv(fixer_cache.CACHE_ENV, "")
+    assert fixer_cache.default_directory() is None
+    FindingsRefactoringTool(FIXERS, {}, [], False, True)
+    assert not list(tmp_path.iterdir())
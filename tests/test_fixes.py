@@ -3,6 +3,7 @@ from __future__ import generator_stop
 from fissix import refactor
 
 from libmodernize import fixes
+from libmodernize.refactoring import DiffRefactoringTool
 
 FISSIX_FIXES_PKG = "fissix.fixes"
 LIBMODERNIZE_FIXES_PKG = "libmodernize.fixes"
@@ -36,3 +37,57 @@ def test_fixers_importable():
             __import__(module_name)
         except ImportError:
             raise AssertionError(f"{module_name!r} cannot be imported")
+
+
+def test_libmodernize_fix_names():
+    assert fixes.libmodernize_fix_names == set(
+        refactor.get_fixers_from_package(LIBMODERNIZE_FIXES_PKG)
+    )
+
+
+def test_fixer_triggers():
+    from libmodernize.fixes import fix_imports_six, fix_urllib_six
+
+    check_existence(
+        FISSIX_FIXES_PKG,
+        [name for name in fixes.fixer_triggers if name.startswith("fissix.")],
+    )
+    check_existence(
+        LIBMODERNIZE_FIXES_PKG,
+        [name for name in fixes.fixer_triggers if name.startswith("libmodernize.")],
+    )
+    assert set(fix_imports_six.FixImportsSix.mapping) <= set(
+        fixes.fixer_triggers["libmodernize.fixes.fix_imports_six"]
+    )
+    assert set(fix_urllib_six.MAPPING) <= set(
+        fixes.fixer_triggers["libmodernize.fixes.fix_urllib_six"]
+    )
+
+
+def _applied_to_every_node(fixer):
+    # Like refactor._get_headnode_dict().
+    if fixer.pattern is None:
+        return fixer._accept_type is None
+    try:
+        refactor._get_head_types(fixer.pattern)
+    except refactor._EveryNode:
+        return True
+    return False
+
+
+def test_no_fixer_applied_to_every_node():
+    # Explicit-only fixers, such as fissix's fix_idioms, are skipped.
+    fixer_names = fixes.fissix_fix_names | fixes.libmodernize_fix_names
+    tool = DiffRefactoringTool(sorted(fixer_names))
+    libmodernize_fixers = [
+        fixer
+        for fixer in tool.pre_order + tool.post_order
+        if type(fixer).__module__.startswith(LIBMODERNIZE_FIXES_PKG + ".")
+    ]
+    assert len(libmodernize_fixers) == len(fixes.libmodernize_fix_names)
+    assert all(fixer.BM_compatible for fixer in libmodernize_fixers)
+    assert not [
+        type(fixer).__module__
+        for fixer in tool.bmi_pre_order + tool.bmi_post_order
+        if _applied_to_every_node(fixer)
+    ]
@@ -6,8 +6,11 @@ import os
 import shutil
 import tempfile
 
+from fissix import pygram, pytree
+from fissix.pgen2 import driver
 from utils import check_on_input
 
+import libmodernize
 from libmodernize.main import main as modernize_main
 
 SINGLE_PRINT_CONTENT = """
@@ -155,3 +158,36 @@ def test_future_import_as_multiple():
 
 def test_future_import_paren():
     check_on_input(*FUTURE_IMPORT_PAREN)
+
+
+def test_add_future_scans_futures_once(monkeypatch):
+    tree = driver.Driver(pygram.python_grammar, convert=pytree.convert).parse_string(
+        '"""doc"""\nfrom __future__ import division\nx = 1\n'
+    )
+    statement = tree.children[-2]
+    scanned = []
+    check_future_import = libmodernize.check_future_import
+
+    def counting_check_future_import(node):
+        scanned.append(node)
+        return check_future_import(node)
+
+    monkeypatch.setattr(
+        libmodernize, "check_future_import", counting_check_future_import
+    )
+    for _ in range(3):
+        libmodernize.add_future(statement, "print_function")
+        libmodernize.add_future(statement, "division")
+    assert len(scanned) == 2
+    # Inserting a statement before the first one that is not a future
+    # import makes add_future() look again.
+    libmodernize.touch_import(None, "six", statement)
+    libmodernize.add_future(statement, "absolute_import")
+    assert str(tree) == (
+        '"""doc"""\n'
+        "from __future__ import division\n"
+        "from __future__ import print_function\n"
+        "from __future__ import absolute_import\n"
+        "import six\n"
+        "x = 1\n"
+    )
@@ -1,7 +1,14 @@
 from __future__ import generator_stop
 
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
 import sys
 
+import pytest
+
 try:
     from StringIO import StringIO  # Python 2
 except ImportError:
@@ -10,6 +17,7 @@ except ImportError:
 from utils import check_on_input
 
 from libmodernize.main import main as modernize_main
+from libmodernize.refactoring import PerFixerRefactoringTool
 
 
 def test_list_fixers():
@@ -55,3 +63,274 @@ def test_enforce():
         extra_flags=["--enforce"],
         expected_return_code=2,
     )
+
+
+def test_check_only(tmp_path, capsys):
+    for name in ("a.py", "b.py", "c.py"):
+        (tmp_path / name).write_text(NO_SIX_SAMPLE)
+    (tmp_path / "unchanged.py").write_text("a = 1\n")
+    assert modernize_main(["--check-only", str(tmp_path)]) == 2
+    out = capsys.readouterr().out
+    assert sorted(out.splitlines()) == [
+        str(tmp_path / name) for name in ("a.py", "b.py", "c.py")
+    ]
+    assert modernize_main(["--check-only", "--fail-fast", str(tmp_path)]) == 2
+    assert len(capsys.readouterr().out.splitlines()) == 1
+    assert modernize_main(["--check-only", str(tmp_path / "unchanged.py")]) == 0
+    assert capsys.readouterr().out == ""
+    with pytest.raises(SystemExit):
+        modernize_main(["--fail-fast", str(tmp_path)])
+
+
+def _run_json(args):
+    sio = StringIO()
+    real_stdout = sys.stdout
+    sys.stdout = sio
+    try:
+        modernize_main(["--json"] + args)
+    finally:
+        sys.stdout = real_stdout
+    return json.loads(sio.getvalue())
+
+
+def test_json_per_fixer(tmp_path):
+    sample = tmp_path / "sample.py"
+    sample.write_text(NO_SIX_SAMPLE)
+    report = _run_json(["--original-diff", str(sample)])
+    assert report["libmodernize.fixes.fix_xrange_six"]["result"] == {
+        str(sample): {
+            "@@ -1,4 +1,5 @@": {
+                "1": "-a = range(10)\n"
+                "+from six.moves import range\n"
+                "+a = list(range(10))\n"
+            }
+        }
+    }
+    assert "six.with_metaclass" in (
+        report["libmodernize.fixes.fix_metaclass"]["original_diff"]
+    )
+    assert "six.with_metaclass" not in (
+        report["libmodernize.fixes.fix_xrange_six"]["original_diff"]
+    )
+    assert report["fissix.fixes.fix_apply"] == {"result": {}, "original_diff": ""}
+    compact = _run_json([str(sample)])
+    assert compact["fissix.fixes.fix_apply"] == {"result": {}}
+    assert compact["libmodernize.fixes.fix_xrange_six"] == {
+        "result": report["libmodernize.fixes.fix_xrange_six"]["result"]
+    }
+
+
+def test_json_per_fixer_same_as_single_fixer(tmp_path):
+    sample = tmp_path / "sample.py"
+    cases = [
+        # A single fixer changes the file.
+        ("print 'world'\n", ["libmodernize.fixes.fix_print"]),
+        # The fixer that sorts last is applied to the tree the fixers were
+        # matched against.
+        (
+            "d.iteritems()\nprint k, v\n",
+            ["libmodernize.fixes.fix_dict_six", "libmodernize.fixes.fix_print"],
+        ),
+    ]
+    for source, fixers in cases:
+        sample.write_text(source)
+        report = _run_json([str(sample)])
+        assert sorted(name for name, diff in report.items() if diff["result"]) == (
+            fixers
+        )
+        for fixer in fixers:
+            assert _run_json(["-f", fixer, str(sample)]) == {fixer: report[fixer]}
+
+
+def test_json_findings(tmp_path):
+    sample = tmp_path / "sample.py"
+    sample.write_text(NO_SIX_SAMPLE)
+    report = _run_json(["--findings", str(sample)])
+    assert report["libmodernize.fixes.fix_xrange_six"] == {
+        str(sample): [
+            [1, 0, "", "from six.moves import range\n"],
+            [1, 4, "range(10)", "list(range(10))"],
+        ]
+    }
+    [metaclass] = [
+        finding
+        for finding in report["libmodernize.fixes.fix_metaclass"][str(sample)]
+        if finding[2]
+    ]
+    assert metaclass[:2] == [3, 0]
+    assert metaclass[3].startswith("class B(six.with_metaclass(Meta,")
+    assert report["fissix.fixes.fix_apply"] == {}
+
+
+def test_json_findings_chained(tmp_path):
+    sample = tmp_path / "sample.py"
+    sample.write_text("print d.keys()\n")
+    report = _run_json(["--findings", str(sample)])
+    assert report["libmodernize.fixes.fix_dict_six"][str(sample)] == [
+        [1, 6, "d.keys()", "list(d.keys())"]
+    ]
+    # fix_dict_six changed the statement before fix_print transformed it.
+    assert [1, 0, "print d.keys()", "print(list(d.keys()))"] in (
+        report["libmodernize.fixes.fix_print"][str(sample)]
+    )
+
+
+def test_json_cache(tmp_path, monkeypatch):
+    sample = tmp_path / "sample.py"
+    sample.write_text(NO_SIX_SAMPLE)
+    args = ["--cache-dir", str(tmp_path / "cache"), str(sample)]
+    report = _run_json(args)
+
+    def refactor_string(self, data, name):
+        raise AssertionError("unchanged file parsed again")
+
+    monkeypatch.setattr(PerFixerRefactoringTool, "refactor_string", refactor_string)
+    assert _run_json(args) == report
+    sample.write_text(NO_SIX_SAMPLE + "b = range(3)\n")
+    with pytest.raises(AssertionError):
+        _run_json(args)
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="requires git")
+def test_json_since(tmp_path, monkeypatch):
+    def git(*args):
+        subprocess.run(("git",) + args, cwd=str(tmp_path), check=True)
+
+    git("init", "-q")
+    (tmp_path / "old.py").write_text(NO_SIX_SAMPLE)
+    (tmp_path / "edited.py").write_text("a = 1\n")
+    git("add", ".")
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "base")
+    (tmp_path / "edited.py").write_text("a = range(1)\n")
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "new.py").write_text("b = range(2)\n")
+    (tmp_path / "notes.txt").write_text("c = range(3)\n")
+    (tmp_path / ".gitignore").write_text("ignored.py\n")
+    git("add", ".")
+    # Neither added nor committed.
+    (tmp_path / "pkg" / "untracked.py").write_text("d = range(4)\n")
+    (tmp_path / "ignored.py").write_text("e = range(5)\n")
+    monkeypatch.chdir(tmp_path)
+
+    report = _run_json(["--findings", "--since", "HEAD"])
+    findings = report["libmodernize.fixes.fix_xrange_six"]
+    assert set(findings) == {
+        "edited.py",
+        os.path.join("pkg", "new.py"),
+        os.path.join("pkg", "untracked.py"),
+    }
+    report = _run_json(["--findings", "--since", "HEAD", "pkg"])
+    findings = report["libmodernize.fixes.fix_xrange_six"]
+    assert set(findings) == {
+        os.path.join("pkg", "new.py"),
+        os.path.join("pkg", "untracked.py"),
+    }
+    monkeypatch.chdir(tmp_path / "pkg")
+    report = _run_json(["--findings", "--since", "HEAD"])
+    findings = report["libmodernize.fixes.fix_xrange_six"]
+    assert set(findings) == {"new.py", "untracked.py"}
+    monkeypatch.chdir(tmp_path)
+    assert modernize_main(["--since", "no-such-ref"]) == 2
+    # Not taken for an option of git.
+    assert modernize_main(["--since", "--output=out.txt"]) == 2
+    assert not (tmp_path / "out.txt").exists()
+
+
+def test_ndjson(tmp_path):
+    sample = tmp_path / "sample.py"
+    sample.write_text(NO_SIX_SAMPLE)
+    unchanged = tmp_path / "unchanged.py"
+    unchanged.write_text("a = 1\n")
+    sio = StringIO()
+    real_stdout = sys.stdout
+    sys.stdout = sio
+    try:
+        exitcode = modernize_main(["--ndjson", "--enforce", str(tmp_path)])
+    finally:
+        sys.stdout = real_stdout
+    assert exitcode == 2, exitcode
+    *records, summary = [json.loads(line) for line in sio.getvalue().splitlines()]
+    assert {record["file"] for record in records} == {str(sample)}
+    assert "@@ -1,4 +1,5 @@" in records[0]["result"]
+    assert "original_diff" not in records[0]
+    assert {record["fixer"] for record in records} == {
+        "libmodernize.fixes.fix_metaclass",
+        "libmodernize.fixes.fix_xrange_six",
+    }
+    assert summary["summary"]["files"] == 2
+    assert summary["summary"]["changed_files"] == 1
+    assert summary["summary"]["fixers"]["libmodernize.fixes.fix_xrange_six"] == 1
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="worker processes need to share the refactoring tool",
+)
+def test_processes_json_enforce(tmp_path):
+    for i in range(4):
+        (tmp_path / f"sample{i}.py").write_text(NO_SIX_SAMPLE)
+    (tmp_path / "unchanged.py").write_text("a = 1\n")
+    sio = StringIO()
+    real_stdout = sys.stdout
+    sys.stdout = sio
+    try:
+        exitcode = modernize_main(
+            ["--json", "--original-diff", "--enforce", "-j", "2", str(tmp_path)]
+        )
+    finally:
+        sys.stdout = real_stdout
+    assert exitcode == 2, exitcode
+    report = json.loads(sio.getvalue())
+    diff = report["libmodernize.fixes.fix_xrange_six"]["original_diff"]
+    assert diff.count("+from six.moves import range") == 4
+    # The changes of each file are kept apart.
+    result = report["libmodernize.fixes.fix_xrange_six"]["result"]
+    assert sorted(result) == [str(tmp_path / f"sample{i}.py") for i in range(4)]
+    for hunks in result.values():
+        assert list(hunks) == ["@@ -1,4 +1,5 @@"]
+        assert list(hunks["@@ -1,4 +1,5 @@"]) == ["1"]
+
+
+def test_write_backup(tmp_path):
+    sample = tmp_path / "sample.py"
+    original = "# -*- coding: latin-1 -*-\r\nb = 'caf\xe9'\r\na = range(10)\r\n"
+    sample.write_bytes(original.encode("latin-1"))
+    sample.chmod(0o754)
+    inode = sample.stat().st_ino
+    assert modernize_main(["-w", "--no-diffs", str(sample)]) == 0
+    written = sample.read_bytes().decode("latin-1")
+    assert "b = 'caf\xe9'\r\na = list(range(10))\r\n" in written
+    assert sample.stat().st_mode & 0o777 == 0o754
+    backup = tmp_path / "sample.py.bak"
+    assert backup.read_bytes() == original.encode("latin-1")
+    assert backup.stat().st_ino == inode
+    assert sorted(os.listdir(str(tmp_path))) == ["sample.py", "sample.py.bak"]
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="requires symlinks")
+def test_write_symlink(tmp_path):
+    (tmp_path / "real").mkdir()
+    target = tmp_path / "real" / "sample.py"
+    target.write_text("a = range(10)\n")
+    link = tmp_path / "link.py"
+    link.symlink_to(target)
+    assert modernize_main(["-w", "--no-diffs", str(link)]) == 0
+    assert link.is_symlink()
+    assert "a = list(range(10))" in target.read_text()
+    assert (tmp_path / "real" / "sample.py.bak").read_text() == "a = range(10)\n"
+    assert sorted(os.listdir(str(tmp_path))) == ["link.py", "real"]
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="worker processes need to share the refactoring tool",
+)
+def test_profile_fixers(tmp_path, capsys):
+    for i in range(3):
+        (tmp_path / f"sample{i}.py").write_text(NO_SIX_SAMPLE)
+    args = ["--profile-fixers", "json", "--no-diffs", "-j", "2", str(tmp_path)]
+    assert modernize_main(args) == 0
+    stderr = capsys.readouterr().err
+    profile = json.loads(stderr[stderr.index("{\n") :])
+    assert profile["libmodernize.fixes.fix_xrange_six"]["transforms"] == 3
+    assert profile["libmodernize.fixes.fix_metaclass"]["matches"] == 3
@@ -0,0 +1,82 @@
+from __future__ import generator_stop
+
+import json
+import os
+
+from libmodernize.main import main as modernize_main
+from libmodernize.metrics import RunMetrics, percentile
+
+
+def test_percentile():
+    ordered = list(range(1, 101))
+    assert percentile(ordered, 50) == 50
+    assert percentile(ordered, 99) == 99
+    assert percentile([3], 95) == 3
+    assert percentile([], 50) is None
+
+
+def test_merge_workers():
+    worker = RunMetrics()
+    worker.file_done(6, 0.5, ([], ["sample.py"], [], [], False), None)
+    worker.file_done(6, 0.25, ([], [], [], [], False), "cached")
+    worker.file_done(6, None, ([], [], [("error", (), {})], [], False), None)
+    files, peak = worker.take()
+    assert worker.files == []
+    # Pretend the files were refactored by another process.
+    files = [(-1,) + file[1:] for file in files]
+    metrics = RunMetrics()
+    metrics.merge((files, {-1: 1024}))
+    summary = metrics.summary()
+    assert summary["files"] == {
+        "scanned": 3,
+        "cached": 1,
+        "changed": 1,
+        "unchanged": 1,
+        "skipped": 0,
+        "failed": 1,
+    }
+    assert summary["bytes"] == 18
+    assert summary["latency_seconds"] == {
+        "p50": 0.25,
+        "p95": 0.5,
+        "p99": 0.5,
+        "max": 0.5,
+    }
+    (worker_summary,) = summary["workers"]
+    assert worker_summary["pid"] == -1
+    assert worker_summary["files"] == 3
+    assert worker_summary["busy_seconds"] == 0.75
+    assert worker_summary["peak_rss_bytes"] == 1024
+
+
+def test_metrics_out(tmp_path):
+    # 17 characters, but 18 bytes.
+    (tmp_path / "changed.py").write_bytes("# \xe9\na = range(3)\n".encode("utf-8"))
+    (tmp_path / "skipped.py").write_text("a = 1\n")
+    (tmp_path / "broken.py").write_text("a = range(\n")
+    out = tmp_path / "metrics.json"
+    args = ["--no-diffs", "-f", "xrange_six", "--metrics-out", str(out), str(tmp_path)]
+    assert modernize_main(args) == 1
+    summary = json.loads(out.read_text())
+    assert summary["files"] == {
+        "scanned": 3,
+        "cached": 0,
+        "changed": 1,
+        "unchanged": 0,
+        "skipped": 1,
+        "failed": 1,
+    }
+    assert summary["bytes"] == 35
+    assert summary["workers"][0]["pid"] == os.getpid()
+
+    prometheus = tmp_path / "metrics.prom"
+    args[4:5] = [str(prometheus), "--metrics-format", "prometheus"]
+    assert modernize_main(args) == 1
+    lines = prometheus.read_text().splitlines()
+    assert "# TYPE modernize_files gauge" in lines
+    assert 'modernize_files{status="skipped"} 1' in lines
+    assert "modernize_files_scanned 3" in lines
+    assert any(
+        line.startswith('modernize_worker_utilisation{worker="0"}') for line in lines
+    )
+    assert os.listdir(str(tmp_path)).count("metrics.prom") == 1
@@ -0,0 +1,99 @@
+from __future__ import generator_stop
+
+from libmodernize.fixes import (
+    fissix_fix_names,
+    libmodernize_fix_names,
+    opt_in_fix_names,
+)
+from libmodernize.prefilter import TriggerFilter
+from libmodernize.refactoring import DiffRefactoringTool, PerFixerRefactoringTool
+
+FIXERS = [
+    "libmodernize.fixes.fix_unicode",
+    "libmodernize.fixes.fix_basestring",
+    "libmodernize.fixes.fix_classic_division",
+    "libmodernize.fixes.fix_xrange_six",
+]
+
+
+def _fixer_names(fixers):
+    return sorted(type(fixer).__module__ for fixer in fixers)
+
+
+def test_fixers_for():
+    tool = DiffRefactoringTool(FIXERS[1:])
+    trigger_filter = TriggerFilter(tool.pre_order + tool.post_order)
+    assert trigger_filter.fixers_for("a = 1\nb = ranges\n") == set()
+    assert _fixer_names(trigger_filter.fixers_for("a = x / 2  # basestring")) == [
+        "libmodernize.fixes.fix_basestring",
+        "libmodernize.fixes.fix_classic_division",
+    ]
+    # Fixers without triggers may change anything.
+    tool = DiffRefactoringTool(FIXERS)
+    trigger_filter = TriggerFilter(tool.pre_order + tool.post_order)
+    assert _fixer_names(trigger_filter.fixers_for("b = xrange(3)\n")) == [
+        "libmodernize.fixes.fix_unicode",
+        "libmodernize.fixes.fix_xrange_six",
+    ]
+
+
+def test_default_fixers_have_triggers():
+    # The fixers that modernize applies without any options.
+    tool = DiffRefactoringTool(
+        (fissix_fix_names | libmodernize_fix_names)
+        - opt_in_fix_names
+        - {"libmodernize.fixes.fix_unicode", "libmodernize.fixes.fix_unicode_future"}
+    )
+    trigger_filter = TriggerFilter(tool.pre_order + tool.post_order)
+    assert trigger_filter.always == set()
+    assert trigger_filter.fixers_for("a = [1, 2.5, 0]\n") == set()
+    for source in ("a = 0777\n", "a = 10L\n", "a = 0xffL\n"):
+        assert _fixer_names(trigger_filter.fixers_for(source)) == [
+            "fissix.fixes.fix_numliterals"
+        ]
+
+
+def test_untriggered_source_not_parsed(monkeypatch):
+    tool = DiffRefactoringTool(FIXERS[1:])
+
+    def parse_string(text):
+        raise AssertionError("parsed")
+
+    monkeypatch.setattr(tool.driver, "parse_string", parse_string)
+    assert tool.refactor_string("a = [1, 2]\n", "sample.py") is None
+    assert tool.errors == []
+
+
+def test_only_triggered_fixers_applied():
+    tool = DiffRefactoringTool(FIXERS)
+    applied = []
+    for fixer in tool.pre_order + tool.post_order:
+
+        def start_tree(tree, name, fixer=fixer, start_tree=fixer.start_tree):
+            applied.append(fixer)
+            start_tree(tree, name)
+
+        fixer.start_tree = start_tree
+    tree = tool.refactor_string("a = basestring\nb = range(3)\n", "sample.py")
+    assert "a = six.string_types\nb = list(range(3))\n" in str(tree)
+    assert _fixer_names(applied) == [
+        "libmodernize.fixes.fix_basestring",
+        "libmodernize.fixes.fix_unicode",
+        "libmodernize.fixes.fix_xrange_six",
+    ]
+    # The whole set of fixers is back in place afterwards.
+    assert len(tool.BM.fixers) + len(tool.bmi_post_order) + len(
+        tool.bmi_pre_order
+    ) == len(FIXERS)
+
+
+def test_per_fixer_skips_untriggered_fixers(monkeypatch):
+    tool = PerFixerRefactoringTool(FIXERS, {}, [], False, True)
+    skipped = tool.fixer_tools["libmodernize.fixes.fix_classic_division"]
+
+    def refactor_tree(tree, name):
+        raise AssertionError("fixer applied")
+
+    monkeypatch.setattr(skipped, "refactor_tree", refactor_tree)
+    tool.refactor_input("a = range(3)\n", "sample.py")
+    assert list(tool.diffs["libmodernize.fixes.fix_xrange_six"])
@@ -0,0 +1,53 @@
+from __future__ import generator_stop
+
+from libmodernize.profiling import FixerProfile
+from libmodernize.refactoring import DiffRefactoringTool, FindingsRefactoringTool
+
+XRANGE = "libmodernize.fixes.fix_xrange_six"
+SAMPLE = "for i in xrange(3):\n    pass\n"
+
+
+def test_profile_fixers():
+    tool = DiffRefactoringTool([XRANGE])
+    profile = FixerProfile()
+    tool.set_profile(profile)
+    tool.refactor_string(SAMPLE, "<test>")
+    stats = profile.stats[XRANGE]
+    assert (stats.candidates, stats.matches, stats.transforms) == (1, 1, 1)
+    assert stats.match > 0 and stats.transform > 0 and stats.start_tree > 0
+    # The imports were inserted by the transformations.
+    assert stats.imports > 0
+    assert profile.to_json()[XRANGE]["transforms"] == 1
+    assert profile.format_table().splitlines()[1].startswith(XRANGE)
+
+
+def test_set_profile_restores_fixers():
+    tool = FindingsRefactoringTool([XRANGE], {}, [], False, True)
+    (fixer,) = tool.fixer_instances()
+    transform = fixer.transform
+    tool.set_profile(FixerProfile())
+    assert fixer.transform is not transform
+    tool.set_profile(None)
+    assert fixer.transform is transform
+    assert "match" not in vars(fixer)
+    # The transformations are still recorded.
+    tool.refactor_input(SAMPLE + "\n", "<test>")
+    assert len(tool.findings) == 2
+
+
+def test_worker_profile(tmp_path):
+    sample = tmp_path / "sample.py"
+    sample.write_text(SAMPLE)
+    tool = DiffRefactoringTool([XRANGE])
+    profile = FixerProfile()
+    tool.set_profile(profile)
+    results, measured = tool.refactor_in_worker([str(sample)] * 2)
+    worker_profile = measured["profile"]
+    assert len(results) == 2 and list(measured) == ["profile"]
+    assert worker_profile[XRANGE].transforms == 2
+    # What was sent is not sent again.
+    assert profile.stats[XRANGE].transforms == 0
+    merged = FixerProfile()
+    merged.merge(worker_profile)
+    merged.merge(worker_profile)
+    assert merged.stats[XRANGE].candidates == 4
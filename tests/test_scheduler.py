@@ -0,0 +1,68 @@
+from __future__ import generator_stop
+
+import pytest
+
+from libmodernize import scheduler
+
+
+def test_schedule_largest_first_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler, "MIN_CHUNK_SIZE", 100)
+    sizes = {"small1.py": 10, "huge.py": 500, "small2.py": 60, "big.py": 150}
+    for name, size in sizes.items():
+        (tmp_path / name).write_text("a" * size)
+    names = [str(tmp_path / name) for name in sizes]
+    missing = str(tmp_path / "missing.py")
+    chunks = scheduler.schedule(names + [missing], 2)
+    assert chunks == [
+        [str(tmp_path / "huge.py")],
+        [str(tmp_path / "big.py")],
+        [str(tmp_path / "small2.py"), str(tmp_path / "small1.py"), missing],
+    ]
+
+
+def test_schedule_chunk_files(tmp_path):
+    names = []
+    for i in range(scheduler.MAX_CHUNK_FILES + 1):
+        (tmp_path / f"{i}.py").write_text("")
+        names.append(str(tmp_path / f"{i}.py"))
+    chunks = scheduler.schedule(names, 4)
+    assert [len(chunk) for chunk in chunks] == [scheduler.MAX_CHUNK_FILES, 1]
+
+
+@pytest.mark.parametrize(
+    "files, limit",
+    [
+        ({"/sys/fs/cgroup/cpu.max": "150000 100000\n"}, 2),
+        ({"/sys/fs/cgroup/cpu.max": "max 100000\n"}, None),
+        (
+            {
+                "/sys/fs/cgroup/cpu/cpu.cfs_quota_us": "400000\n",
+                "/sys/fs/cgroup/cpu/cpu.cfs_period_us": "100000\n",
+            },
+            4,
+        ),
+        (
+            {
+                "/sys/fs/cgroup/cpu/cpu.cfs_quota_us": "-1\n",
+                "/sys/fs/cgroup/cpu/cpu.cfs_period_us": "100000\n",
+            },
+            None,
+        ),
+        ({}, None),
+    ],
+)
+def test_cgroup_cpu_limit(monkeypatch, files, limit):
+    def read_first_line(path):
+        return files[path].split() if path in files else None
+
+    monkeypatch.setattr(scheduler, "_read_first_line", read_first_line)
+    assert scheduler.cgroup_cpu_limit() == limit
+
+
+def test_parse_processes(monkeypatch):
+    monkeypatch.setattr(scheduler, "cgroup_cpu_limit", lambda: 1)
+    assert scheduler.parse_processes("auto") == 1
+    assert scheduler.parse_processes("3") == 3
+    for value in ("0", "-2", "many"):
+        with pytest.raises(ValueError):
+            scheduler.parse_processes(value)
@@ -0,0 +1,99 @@
+"""Startup time budget of the modernize command line.
+
+The budgets are the time a run may take on top of starting a bare Python
+interpreter, as the best of a few runs. Wall-clock times depend on the load
+of the machine, so the budgets are only checked if ``MODERNIZE_STARTUP_BUDGETS``
+is set, as in ``tox -e startup``. Set ``MODERNIZE_STARTUP_BUDGET_SCALE`` to
+scale them on slow machines. Which modules are imported is always checked.
+"""
+
+from __future__ import generator_stop
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import libmodernize
+
+VERSION_BUDGET = 0.3
+SINGLE_FILE_BUDGET = 1.5
+
+RUN_MAIN = "import sys; from libmodernize.main import main; sys.exit(main())"
+
+IMPORTED_MODULES = """\
+import sys
+from libmodernize.main import main
+try:
+    main(sys.argv[1:])
+except SystemExit:
+    pass
+print(sorted(m for m in sys.modules if m.startswith(("fissix", "libmodernize."))))
+"""
+
+
+def _env(tmp_path):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(libmodernize.__file__))
+    env["MODERNIZE_FIXER_CACHE"] = str(tmp_path / "fixers")
+    return env
+
+
+def _best_time(args, env, runs=3):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + args,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _budget(seconds):
+    return seconds * float(os.environ.get("MODERNIZE_STARTUP_BUDGET_SCALE", "1"))
+
+
+def _imported_modules(args, env):
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORTED_MODULES] + args,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+        check=True,
+    ).stdout
+    return output.strip().splitlines()[-1]
+
+
+def test_version_and_list_fixes_import_no_fixers(tmp_path):
+    env = _env(tmp_path)
+    for args in (["--version"], ["--list-fixes"], ["--help"]):
+        assert (
+            _imported_modules(args, env)
+            == "['libmodernize.fixes', 'libmodernize.main']"
+        )
+
+
+@pytest.mark.skipif(
+    not os.environ.get("MODERNIZE_STARTUP_BUDGETS"),
+    reason="set MODERNIZE_STARTUP_BUDGETS to check the startup time budgets",
+)
+def test_startup_budget(tmp_path):
+    env = _env(tmp_path)
+    sample = tmp_path / "sample.py"
+    sample.write_text("a = range(10)\n")
+    interpreter = _best_time(["-c", "pass"], env)
+
+    version = _best_time(["-c", RUN_MAIN, "--version"], env)
+    assert version - interpreter < _budget(VERSION_BUDGET)
+
+    # The first run fills the fixer cache.
+    single_file = _best_time(["-c", RUN_MAIN, str(sample)], env)
+    assert single_file - interpreter < _budget(SINGLE_FILE_BUDGET)
@@ -0,0 +1,63 @@
+from __future__ import generator_stop
+
+import json
+import os
+
+from libmodernize.main import main as modernize_main
+from libmodernize.refactoring import DiffRefactoringTool
+from libmodernize.tracing import Tracer
+
+XRANGE = "libmodernize.fixes.fix_xrange_six"
+SAMPLE = "for i in xrange(3):\n    pass\n"
+
+
+def test_trace_worker(tmp_path):
+    sample = tmp_path / "sample.py"
+    sample.write_text(SAMPLE)
+    tool = DiffRefactoringTool([XRANGE])
+    tool.set_tracer(Tracer())
+    results, measured = tool.refactor_in_worker([str(sample)])
+    events = measured["tracer"]
+    assert [event["name"] for event in events] == [
+        "read",
+        "decode",
+        "parse",
+        "fixers",
+        "diff",
+        "file",
+        "chunk",
+    ]
+    assert all(event["pid"] == os.getpid() for event in events)
+    assert events[0]["args"] == {"file": str(sample)}
+    # The file span encloses the spans of its phases.
+    file_span = events[-2]
+    for event in events[:-2]:
+        assert file_span["ts"] <= event["ts"]
+        assert event["ts"] + event["dur"] <= file_span["ts"] + file_span["dur"]
+    assert tool.tracer.events == []
+    tool.set_tracer(None)
+    assert "parse_tokens" not in vars(tool.driver)
+
+
+def test_trace_option(tmp_path):
+    sample = tmp_path / "sample.py"
+    sample.write_text(SAMPLE)
+    trace = tmp_path / "trace.json"
+    args = ["-w", "-n", "--no-diffs", "--trace", str(trace), str(sample)]
+    assert modernize_main(args) == 0
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert events[0] == {
+        "name": "process_name",
+        "ph": "M",
+        "pid": os.getpid(),
+        "tid": os.getpid(),
+        "args": {"name": "modernize"},
+    }
+    assert {event["name"] for event in events[1:]} == {
+        "read",
+        "decode",
+        "parse",
+        "fixers",
+        "write",
+        "file",
+    }